@@ -0,0 +1,166 @@
+"""
+requests/second of SlackHttpApp against calling `execute` directly (the sync path).
+In-process: `execute`, `handle`, `wsgi` and `asgi` without sockets, to see the cost of the adapter itself.
+Over HTTP: client threads with keep-alive connections, against uvicorn if installed,
+otherwise against the threaded wsgiref server of the standard library (one connection per request).
+
+    $ python benchmark/http_adapter.py --requests 20000 --clients 8
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import http.client
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from slack_api_decorator import EventSubscription  # noqa: E402
+from slack_api_decorator.server import SlackHttpApp  # noqa: E402
+
+SECRET = "benchmark-secret"
+PAYLOAD = {"team_id": "T", "event": {"type": "reaction_added", "user": "U", "reaction": "+1",
+                                     "item": {"channel": "C"}}}
+BODY = json.dumps(PAYLOAD).encode()
+
+
+def build() -> SlackHttpApp:
+    es = EventSubscription("bench")
+    for i in range(10):
+        es.add("reaction_added", reaction=f"r{i}")(lambda params: params)
+    es.add("reaction_added", reaction="+1")(lambda params: params)
+    # the timestamp is fixed, so that the same headers are valid for the whole run
+    return SlackHttpApp(event_subscription=es, signing_secret=SECRET, clock=lambda: 0)
+
+
+def signed_headers() -> dict:
+    digest = hmac.new(SECRET.encode(), b"v0:0:" + BODY, hashlib.sha256).hexdigest()
+    return {"x-slack-request-timestamp": "0", "x-slack-signature": f"v0={digest}",
+            "content-type": "application/json"}
+
+
+def report(name: str, count: int, seconds: float):
+    print(f"{name:<28} {count / seconds:>10.0f} req/s")
+
+
+def bench_in_process(app: SlackHttpApp, count: int):
+    headers = signed_headers()
+    started = time.perf_counter()
+    for _ in range(count):
+        app.event_subscription.execute(json.loads(BODY))
+    report("execute (sync path)", count, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(count):
+        app.handle("POST", "/slack/events", headers, BODY)
+    report("handle", count, time.perf_counter() - started)
+
+    environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/slack/events", "CONTENT_LENGTH": str(len(BODY)),
+               "CONTENT_TYPE": "application/json"}
+    environ.update({f"HTTP_{k.upper().replace('-', '_')}": v for k, v in headers.items()})
+    started = time.perf_counter()
+    for _ in range(count):
+        app.wsgi({**environ, "wsgi.input": io.BytesIO(BODY)}, lambda status, response_headers: None)
+    report("wsgi", count, time.perf_counter() - started)
+
+    scope = {"type": "http", "method": "POST", "path": "/slack/events",
+             "headers": [(k.encode(), v.encode()) for k, v in headers.items()]}
+
+    async def one():
+        async def receive():
+            return {"type": "http.request", "body": BODY, "more_body": False}
+
+        async def send(message):
+            pass
+
+        await app.asgi(scope, receive, send)
+
+    async def many():
+        # 64 requests in flight, as an event loop serving keep-alive connections would have
+        for _ in range(count // 64):
+            await asyncio.gather(*[one() for _ in range(64)])
+
+    started = time.perf_counter()
+    asyncio.run(many())
+    report("asgi (64 in flight)", count // 64 * 64, time.perf_counter() - started)
+
+
+def load(port: int, count: int, clients: int, keep_alive: bool) -> float:
+    headers = signed_headers()
+    per_client = count // clients
+
+    def client():
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        for _ in range(per_client):
+            if not keep_alive:
+                connection = http.client.HTTPConnection("127.0.0.1", port)
+            connection.request("POST", "/slack/events", body=BODY, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            assert response.status == 200, response.status
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def bench_http(app: SlackHttpApp, count: int, clients: int):
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+
+    if uvicorn is not None:
+        config = uvicorn.Config(app.asgi, host="127.0.0.1", port=8765, log_level="warning", lifespan="off")
+        server = uvicorn.Server(config)
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        report(f"uvicorn asgi, {clients} clients", count // clients * clients, load(8765, count, clients, True))
+        server.should_exit = True
+        thread.join()
+    else:
+        print("uvicorn is not installed, skipped the ASGI server")
+
+    server = make_server("127.0.0.1", 0, app.wsgi, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    seconds = load(server.server_port, count, clients, False)
+    report(f"wsgiref wsgi, {clients} clients", count // clients * clients, seconds)
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=8)
+    args = parser.parse_args()
+    app = build()
+    bench_in_process(app, args.requests)
+    bench_http(app, args.requests // 4, args.clients)
+    app.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+memory used by 10k registered handlers.
+
+    $ python benchmark/memory_handlers.py
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from slack_api_decorator import EventSubscription  # noqa: E402
+from slack_api_decorator.handler import Handler  # noqa: E402
+
+HANDLER_COUNT = 10_000
+
+
+def handler(params):
+    return params
+
+
+def measure(build: callable) -> int:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    kept = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def build_dict_records():
+    # the shape used before `Handler`
+    return [{
+        "app_name": "bench",
+        "event_type": f"event_{i % 100}",
+        "conditions": [],
+        "after": None,
+        "function": handler,
+        "guard": False
+    } for i in range(HANDLER_COUNT)]
+
+
+def build_handler_records():
+    return [Handler(
+        app_name="bench",
+        key=f"event_{i % 100}",
+        conditions=(),
+        after=None,
+        function=handler,
+        guard=False
+    ) for i in range(HANDLER_COUNT)]
+
+
+def build_event_subscription():
+    es = EventSubscription("bench")
+    for i in range(HANDLER_COUNT):
+        es.add(f"event_{i % 100}", user_id=f"U{i}")(handler)
+    return es
+
+
+def main():
+    for name, build in [
+        ("dict records", build_dict_records),
+        ("Handler records", build_handler_records),
+        ("EventSubscription.add (user_id filter)", build_event_subscription),
+    ]:
+        size = measure(build)
+        print(f"{name:<40} {size / 1024:>10.1f} KiB  {size / HANDLER_COUNT:>8.1f} B/handler")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+cost of middleware per dispatch and per layer: composed once at registration,
+against a chain resolved per request by walking the list of middleware.
+
+    $ python benchmark/middleware_overhead.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from slack_api_decorator import EventSubscription  # noqa: E402
+
+PAYLOAD = {"team_id": "T", "event": {"type": "reaction_added", "user": "U", "reaction": "+1",
+                                     "item": {"channel": "C"}}}
+LAYERS = (0, 1, 2, 4, 8)
+NUMBER = 20000
+
+
+def pass_through(call_next):
+    def middleware(params):
+        return call_next(params)
+    return middleware
+
+
+def handler(params):
+    return params
+
+
+def build_composed(layers: int) -> EventSubscription:
+    es = EventSubscription("bench", middleware=[pass_through] * layers)
+    es.add("reaction_added")(handler)
+    return es
+
+
+def build_per_request(layers: int) -> EventSubscription:
+    # the chain is rebuilt for each request, as a list of middleware walked by index
+    chain = [pass_through] * layers
+
+    def resolve(params, index=0):
+        if index == len(chain):
+            return handler(params)
+        return chain[index](lambda p: resolve(p, index + 1))(params)
+
+    es = EventSubscription("bench")
+    es.add("reaction_added")(lambda params: resolve(params))
+    return es
+
+
+def measure(es: EventSubscription) -> float:
+    # the best of some runs, to reduce the noise of other processes
+    return min(timeit.repeat(lambda: es.execute(PAYLOAD), number=NUMBER, repeat=5)) / NUMBER * 1e6
+
+
+def main():
+    print(f"{'layers':>6} {'composed[us]':>14} {'per request[us]':>16}")
+    # warm up, not to count the first run against 0 layers
+    measure(build_composed(0))
+    baseline = None
+    composed_last = 0.0
+    for layers in LAYERS:
+        composed = measure(build_composed(layers))
+        per_request = measure(build_per_request(layers))
+        if baseline is None:
+            baseline = composed
+        composed_last = composed
+        print(f"{layers:>6} {composed:>14.2f} {per_request:>16.2f}")
+    print(f"composed: {(composed_last - baseline) / LAYERS[-1]:.3f} us per layer")
+
+
+if __name__ == "__main__":
+    main()
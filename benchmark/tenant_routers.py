@@ -0,0 +1,57 @@
+"""
+memory and time of the routers of workspaces, each with its own handler besides the ones shared by all.
+
+    $ python benchmark/tenant_routers.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from slack_api_decorator import EventSubscription  # noqa: E402
+
+TEAM_COUNT = 2000
+SHARED_COUNTS = (20, 200)
+
+
+def handler(params):
+    return params
+
+
+def payload(team_id: str) -> dict:
+    return {"team_id": team_id, "event": {"type": "message", "user": "U", "channel": "C", "text": "hello"}}
+
+
+def build(shared_count: int) -> EventSubscription:
+    es = EventSubscription("bench")
+    for i in range(shared_count):
+        es.add("message", keywords=[f"keyword{i}"])(handler)
+    es.add("message")(handler)
+    for i in range(TEAM_COUNT):
+        es.add("message", team_id=f"T{i}", user_id=f"U{i}")(handler)
+    return es
+
+
+def main():
+    print(f"{'shared':>6} {'routers[KiB]':>13} {'per team[B]':>12} {'first execute[us]':>18} {'add[ms]':>8}")
+    for shared_count in SHARED_COUNTS:
+        es = build(shared_count)
+        es.execute(payload("T"))
+        tracemalloc.start()
+        started = time.perf_counter()
+        for i in range(TEAM_COUNT):
+            es.execute(payload(f"T{i}"))
+        elapsed = time.perf_counter() - started
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # the routers in use are compiled again before the swap
+        started = time.perf_counter()
+        es.add("reaction_added", team_id="T0")(handler)
+        added = time.perf_counter() - started
+        print(f"{shared_count:>6} {size / 1024:>13.1f} {size / TEAM_COUNT:>12.1f} "
+              f"{elapsed / TEAM_COUNT * 1e6:>18.1f} {added * 1e3:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+routing messages by text: a regex per `condition` versus `keywords` combined into one matcher.
+
+    $ python benchmark/text_routing.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from slack_api_decorator import EventSubscription  # noqa: E402
+
+HANDLER_COUNT = 200
+TEXT = "could someone take a look at the failing build on the main branch before lunch? " * 3
+
+
+def handler(params):
+    return params
+
+
+def payload(text: str) -> dict:
+    return {"team_id": "T", "event": {"type": "message", "user": "U", "channel": "C", "text": text}}
+
+
+def build_with_conditions() -> EventSubscription:
+    es = EventSubscription("conditions")
+    for i in range(HANDLER_COUNT):
+        pattern = re.compile(rf"(?<!\w)keyword{i}(?!\w)", re.IGNORECASE)
+        es.add("message", condition=lambda x, p=pattern: p.search(x["event"]["text"]) is not None)(handler)
+    es.add("message")(handler)
+    return es
+
+
+def build_with_keywords() -> EventSubscription:
+    es = EventSubscription("keywords")
+    for i in range(HANDLER_COUNT):
+        es.add("message", keywords=[f"keyword{i}"])(handler)
+    es.add("message")(handler)
+    return es
+
+
+def main():
+    for name, es in [("condition per handler", build_with_conditions()),
+                     ("combined keywords", build_with_keywords())]:
+        for label, text in [("no match", TEXT), ("one match", TEXT + " keyword150")]:
+            params = payload(text)
+            es.execute(params)
+            number = 200
+            seconds = timeit.timeit(lambda: es.execute(params), number=number)
+            print(f"{name:<25} {label:<10} {seconds / number * 1e6:>10.1f} us/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+cost of tracing per dispatch: disabled, not sampled, and sampled.
+
+    $ python benchmark/tracing_overhead.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from slack_api_decorator import EventSubscription  # noqa: E402
+from slack_api_decorator.tracing import Tracer  # noqa: E402
+
+PAYLOAD = {"team_id": "T", "event": {"type": "reaction_added", "user": "U", "reaction": "+1",
+                                     "item": {"channel": "C"}}}
+
+
+def build(tracer) -> EventSubscription:
+    es = EventSubscription("bench", tracer=tracer)
+    for i in range(10):
+        es.add("reaction_added", reaction=f"r{i}")(lambda params: params)
+    es.add("reaction_added", reaction="+1")(lambda params: params)
+    return es
+
+
+def main():
+    for name, tracer in [
+        ("no tracer", None),
+        ("sample_rate=0.0", Tracer(sink=lambda record: None, sample_rate=0.0)),
+        ("sample_rate=0.01", Tracer(sink=lambda record: None, sample_rate=0.01)),
+        ("sample_rate=1.0", Tracer(sink=lambda record: None, sample_rate=1.0)),
+    ]:
+        es = build(tracer)
+        number = 20000
+        seconds = timeit.timeit(lambda: es.execute(PAYLOAD), number=number)
+        print(f"{name:<20} {seconds / number * 1e6:>8.2f} us/dispatch")
+
+
+if __name__ == "__main__":
+    main()
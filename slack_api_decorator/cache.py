@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence
+
+from .error import SlackApiDecoratorException
+
+
+def _value_of(params: dict, key: str) -> Optional[str]:
+    # slash command payloads have values as str or list of str
+    value = params.get(key)
+    if type(value) == list:
+        value = value[0] if value else None
+    return None if value is None else str(value)
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    collapse whitespaces including non-breaking spaces, so that `/status  api` and `/status api` share the cache.
+    """
+    if not text:
+        return ""
+    return " ".join(text.replace(u'\xa0', u' ').split())
+
+
+class _Pending:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    per-function cache of slash command responses,
+    keyed by (command, team_id, enterprise_id, normalized text, `vary_on` values),
+    so that a function shared by all workspaces does not return the response of another workspace.
+    Entries expire after `ttl` seconds, and the least recently used entry is evicted beyond `maxsize`.
+    Concurrent requests with the same key wait for the first one, instead of computing the response again.
+    Errors are not cached.
+
+    Examples:
+        >>> @slash_command.add(command="/status", cache=ResponseCache(ttl=30, vary_on=("channel_id",)))
+        >>> def status(params):
+        ...     return {"text": "all systems operational"}
+    """
+
+    def __init__(self,
+                 ttl: float,
+                 maxsize: int = 128,
+                 vary_on: Sequence[str] = (),
+                 clock: callable = time.monotonic):
+        """
+
+        Args:
+            ttl: seconds to keep a response.
+            maxsize: the number of responses kept.
+            vary_on: payload keys added to the cache key, such as `user_id` or `channel_id`.
+            clock: monotonic clock in seconds.
+        """
+        if ttl <= 0 or maxsize <= 0:
+            raise SlackApiDecoratorException("[ttl] and [maxsize] must be positive")
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.vary_on = tuple(vary_on)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (expires_at, response), the least recently used first
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    def key_of(self, params: dict) -> tuple:
+        return (
+            _value_of(params, "command"),
+            _value_of(params, "team_id"),
+            _value_of(params, "enterprise_id"),
+            normalize_text(_value_of(params, "text")),
+            *[_value_of(params, v) for v in self.vary_on]
+        )
+
+    def get_or_compute(self, params: dict, compute: callable) -> Any:
+        """
+        the cached response for the payload, or the response of `compute()` which is cached.
+        """
+        key = self.key_of(params)
+        owner = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                del self._entries[key]
+            pending = self._pending.get(key)
+            if pending is not None:
+                self._coalesced += 1
+            else:
+                self._misses += 1
+                pending = _Pending()
+                self._pending[key] = pending
+                owner = True
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+
+        try:
+            pending.result = compute()
+        except BaseException as e:
+            pending.error = e
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (self._clock() + self.ttl, pending.result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+            return pending.result
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        hits, misses, requests coalesced into a pending computation, evictions, size and hit_rate.
+        """
+        with self._lock:
+            requests = self._hits + self._misses + self._coalesced
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "size": len(self._entries),
+                "hit_rate": (self._hits + self._coalesced) / requests if requests else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from .error import SlackApiDecoratorException
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    stop calling a handler whose downstream dependency is failing.
+    Failures and slow calls are counted in a rolling window of `window` seconds, split into `buckets`.
+    When the failure rate reaches `failure_rate` with at least `minimum_calls`, the circuit opens,
+    and calls fail fast (or go to `on_open` of the handler) for `open_duration` seconds.
+    Then the circuit is half-open, `half_open_calls` probes are let through:
+    it closes if all of them succeed, and opens again if any of them fails.
+
+    One instance is per handler, or shared by the handlers calling the same dependency.
+
+    Examples:
+        >>> circuit = CircuitBreaker(failure_rate=0.5, window=60, slow_call_duration=3.0)
+        >>> @es.add(event_type="message", circuit=circuit, on_open=lambda params: None)
+        >>> def call_api(params):
+        ...     return requests.post(...)
+        >>> circuit.snapshot()
+    """
+
+    def __init__(self,
+                 failure_rate: float = 0.5,
+                 minimum_calls: int = 10,
+                 window: float = 60.0,
+                 buckets: int = 10,
+                 slow_call_duration: Optional[float] = None,
+                 open_duration: float = 30.0,
+                 half_open_calls: int = 1,
+                 failure_types: Tuple[type, ...] = (Exception,),
+                 clock: callable = time.monotonic):
+        """
+
+        Args:
+            failure_rate: ratio of failed and slow calls in the window to open the circuit, from 0 to 1.
+            minimum_calls: the number of calls in the window before the failure rate is evaluated.
+            window: seconds of the rolling window.
+            buckets: the number of buckets of the window, older buckets are dropped as a whole.
+            slow_call_duration: seconds, calls longer than this are counted as failures even if succeeded.
+            open_duration: seconds to fail fast before probing recovery.
+            half_open_calls: the number of probes to close the circuit.
+            failure_types: exceptions counted as failures, others are raised without being counted.
+            clock: monotonic clock in seconds.
+        """
+        if not 0 < failure_rate <= 1:
+            raise SlackApiDecoratorException("[failure_rate] must be in (0, 1]")
+        if minimum_calls <= 0 or window <= 0 or buckets <= 0 or open_duration <= 0 or half_open_calls <= 0:
+            raise SlackApiDecoratorException(
+                "[minimum_calls], [window], [buckets], [open_duration] and [half_open_calls] must be positive")
+        if slow_call_duration is not None and slow_call_duration <= 0:
+            raise SlackApiDecoratorException("[slow_call_duration] must be positive")
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.window = window
+        self.slow_call_duration = slow_call_duration
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self.failure_types = tuple(failure_types)
+        self.clock = clock
+        self._bucket_width = window / buckets
+        self._lock = threading.Lock()
+        # [bucket index, calls, failures, slow calls], the oldest first
+        self._buckets: deque = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._rejected = 0
+        self._opened_count = 0
+
+    @property
+    def state(self) -> str:
+        """
+        `closed`, `open` or `half_open`.
+        """
+        with self._lock:
+            return self._current_state(self.clock())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_duration:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        whether a call is let through. Each allowed call must be followed by `record`.
+        """
+        with self._lock:
+            state = self._current_state(self.clock())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record(self, elapsed: float, failed: Optional[bool]):
+        """
+        record the outcome of an allowed call.
+
+        Args:
+            elapsed: seconds the call took.
+            failed: True if the call raised one of `failure_types`,
+                None if it raised another exception, which is not counted.
+        """
+        slow = self.slow_call_duration is not None and elapsed >= self.slow_call_duration
+        with self._lock:
+            now = self.clock()
+            state = self._current_state(now)
+            if failed is None:
+                if state == HALF_OPEN:
+                    # let another probe through
+                    self._probes = max(0, self._probes - 1)
+                return
+            if state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._state = CLOSED
+                    self._buckets.clear()
+                return
+            if state == OPEN:
+                # a call started before the circuit opened
+                return
+
+            bucket = self._bucket(now)
+            bucket[1] += 1
+            bucket[2] += failed
+            bucket[3] += slow and not failed
+            calls, failures, slow_calls = self._totals()
+            if calls >= self.minimum_calls and (failures + slow_calls) / calls >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._opened_count += 1
+        self._buckets.clear()
+
+    def _bucket(self, now: float) -> list:
+        index = int(now // self._bucket_width)
+        oldest = index - int(round(self.window / self._bucket_width)) + 1
+        while self._buckets and self._buckets[0][0] < oldest:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != index:
+            self._buckets.append([index, 0, 0, 0])
+        return self._buckets[-1]
+
+    def _totals(self) -> Tuple[int, int, int]:
+        calls = failures = slow_calls = 0
+        for _, bucket_calls, bucket_failures, bucket_slow_calls in self._buckets:
+            calls += bucket_calls
+            failures += bucket_failures
+            slow_calls += bucket_slow_calls
+        return calls, failures, slow_calls
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        state, calls, failures and slow calls in the window, failure_rate,
+        the number of calls rejected while open, and the number of times opened.
+        """
+        with self._lock:
+            now = self.clock()
+            state = self._current_state(now)
+            if state == CLOSED:
+                # drop expired buckets without adding one
+                self._bucket(now)
+                if self._buckets and self._buckets[-1][1] == 0:
+                    self._buckets.pop()
+            calls, failures, slow_calls = self._totals()
+            return {
+                "state": state,
+                "calls": calls,
+                "failures": failures,
+                "slow_calls": slow_calls,
+                "failure_rate": (failures + slow_calls) / calls if calls else 0.0,
+                "rejected": self._rejected,
+                "opened_count": self._opened_count,
+            }
+
+    def reset(self):
+        """
+        close the circuit and clear the window.
+        """
+        with self._lock:
+            self._state = CLOSED
+            self._buckets.clear()
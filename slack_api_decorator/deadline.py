@@ -0,0 +1,48 @@
+import logging
+from concurrent.futures import Executor, Future, TimeoutError
+
+from .handler import Handler
+
+logger = logging.getLogger(__name__)
+
+
+def _log_background_error(handler: Handler) -> callable:
+    def callback(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"[{handler.name}] failed after its deadline", exc_info=future.exception())
+    return callback
+
+
+def _acknowledge(handler: Handler, params: dict):
+    if handler.on_timeout is None:
+        return None
+    return handler.on_timeout(params=params)
+
+
+def call_with_deadline(handler: Handler, params: dict, remaining: float, pool: Executor):
+    """
+    call the handler within the `remaining` seconds of its deadline.
+    If the budget is already exhausted or the handler does not finish in time,
+    the response of `on_timeout` (or None) is returned as the ack,
+    and the handler keeps running in the `pool` so that its result still reaches `after`.
+
+    Args:
+        handler: handler with `deadline`.
+        params: payload from slack.
+        remaining: seconds left until the deadline, passed to the function as `remaining`.
+        pool: executor to run the handler.
+    """
+    if remaining <= 0:
+        future = pool.submit(handler.call_with_budget, params, 0.0)
+        future.add_done_callback(_log_background_error(handler))
+        return _acknowledge(handler, params)
+
+    future = pool.submit(handler.call_with_budget, params, remaining)
+    try:
+        return future.result(timeout=remaining)
+    except TimeoutError:
+        if future.done():
+            # TimeoutError raised by the handler itself
+            raise
+        future.add_done_callback(_log_background_error(handler))
+        return _acknowledge(handler, params)
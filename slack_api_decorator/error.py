@@ -17,3 +17,19 @@ class DecoratorAddError(SlackApiDecoratorException):
 
 class DecoratorExecuteError(SlackApiDecoratorException):
     pass
+
+
+class PartitionFullError(DecoratorExecuteError):
+    def __init__(self, partition: int):
+        self.partition = partition
+
+    def __str__(self):
+        return f"partition [{self.partition}] is full"
+
+
+class CircuitOpenError(DecoratorExecuteError):
+    def __init__(self, name: str):
+        self.name = name
+
+    def __str__(self):
+        return f"circuit of [{self.name}] is open"
@@ -1,7 +1,80 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from inspect import signature
-from typing import Optional, Union, List
+from typing import Any, Dict, Optional, Pattern, Union, List
 
+from .circuit import CircuitBreaker
 from .error import SlackParameterNotFoundError, DecoratorAddError, DecoratorExecuteError
+from .fan_out import HandlerResult, run_all
+from .handler import Handler, to_id_set
+from .middleware import to_middleware_tuple
+from .registry import Registry, Router
+from .text_matcher import compile_keywords, compile_text_pattern
+from .process_pool import ProcessPool
+from .profiling import ActiveDispatch, SlowDispatchProfiler
+from .tracing import TraceRecord, Tracer
+from .work_queue import WorkQueue
+
+
+class _IgnoreUserIdList(list):
+    """
+    list of `EventSubscription.ignore_user_id_list`,
+    which replaces the set of user_ids checked while dispatching on each change.
+    Every method of list which adds or removes items is overridden,
+    `sort` and `reverse` only change the order. `copy` and slices are plain lists.
+    """
+
+    def __init__(self, owner: "EventSubscription", user_ids=()):
+        super().__init__(user_ids)
+        self._owner = owner
+
+    def _changed(self):
+        # replaced at once, not to be seen half updated while dispatching
+        self._owner._ignore_user_ids = set(self)
+
+    def append(self, user_id: str):
+        super().append(user_id)
+        self._changed()
+
+    def extend(self, user_ids):
+        super().extend(user_ids)
+        self._changed()
+
+    def insert(self, index: int, user_id: str):
+        super().insert(index, user_id)
+        self._changed()
+
+    def remove(self, user_id: str):
+        super().remove(user_id)
+        self._changed()
+
+    def pop(self, index: int = -1) -> str:
+        user_id = super().pop(index)
+        self._changed()
+        return user_id
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, user_ids):
+        result = super().__iadd__(user_ids)
+        self._changed()
+        return result
+
+    def __imul__(self, n: int):
+        result = super().__imul__(n)
+        self._changed()
+        return result
 
 
 class EventSubscription:
@@ -35,11 +108,48 @@ class EventSubscription:
         >>> es.execute(params=payload_from_slack)
     """
 
-    def __init__(self, app_name: str):
+    def __init__(self,
+                 app_name: str,
+                 max_workers: Optional[int] = None,
+                 queue: Optional[WorkQueue] = None,
+                 ignore_bots: bool = False,
+                 tracer: Optional[Tracer] = None,
+                 profiler: Optional[SlowDispatchProfiler] = None,
+                 max_processes: Optional[int] = None,
+                 middleware: Optional[Union[callable, List[callable]]] = None,
+                 mp_context=None):
+        """
+
+        Args:
+            app_name: application name for the instance. Currently, any name is accepted.
+            max_workers: the number of threads to call handlers in `execute_all`.
+            queue: queue to put payloads in `enqueue`, drained by `QueueWorker`.
+            ignore_bots: if True, events posted by any bot (with `bot_id` or subtype `bot_message`) are ignored.
+            tracer: emits the routing decision of sampled dispatches.
+            profiler: captures stack samples of dispatches slower than its threshold.
+            max_processes: the number of worker processes for functions added with `in_process_pool`.
+            middleware: applied to all functions, outside the ones given to `add`. See `compose`.
+            mp_context: multiprocessing context of the worker processes, such as `multiprocessing.get_context("spawn")`.
+                `forkserver`, or `spawn` where it is not available, if None. See `ProcessPool`.
+        """
         self.app_name = app_name
-        self._executor_list = []
-        self.ignore_user_id_list = []
-        
+        self._registry = Registry(text_of=self._get_text_from)
+        self._ignore_user_ids = set()
+        self._ignore_user_id_list = _IgnoreUserIdList(self)
+        self._ignore_bot_ids = set()
+        self._ignore_subtypes = {"bot_message"} if ignore_bots else set()
+        self._ignore_bots = ignore_bots
+        self._dropped = Counter()
+        self._dropped_lock = threading.Lock()
+        self._max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.queue = queue
+        self._tracer = tracer
+        self._profiler = profiler
+        self._process_pool = ProcessPool(max_workers=max_processes, mp_context=mp_context)
+        self._middleware = to_middleware_tuple("middleware", middleware)
+
     @staticmethod
     def _get_event(params: dict) -> dict:
         """
@@ -65,6 +175,30 @@ class EventSubscription:
             raise SlackParameterNotFoundError("type", event)
         return event['type']
 
+    @staticmethod
+    def _get_team_id_from(params: dict) -> Optional[str]:
+        """
+        get team_id from the payload, None if not found
+        """
+        return params.get("team_id")
+
+    @staticmethod
+    def _get_enterprise_id_from(params: dict) -> Optional[str]:
+        """
+        get enterprise_id from the payload, None if not found
+        """
+        if params.get("enterprise_id"):
+            return params["enterprise_id"]
+        authorizations = params.get("authorizations")
+        if authorizations:
+            return authorizations[0].get("enterprise_id")
+        return None
+
+    def _router_for(self, params: dict) -> Router:
+        return self._registry.router_for(
+            team_id=self._get_team_id_from(params),
+            enterprise_id=self._get_enterprise_id_from(params))
+
     @staticmethod
     def _get_user_id_from(params: dict) -> str:
         """
@@ -89,6 +223,16 @@ class EventSubscription:
         else:
             raise SlackParameterNotFoundError("channel_id", params)
 
+    @staticmethod
+    def _get_text_from(params: dict) -> str:
+        """
+        get text of the message from the payload, empty if not found
+        """
+        event = params.get("event")
+        if not isinstance(event, dict):
+            return ""
+        return event.get("text") or ""
+
     @staticmethod
     def _get_reaction_from(params: dict) -> str:
         event = EventSubscription._get_event(params=params)
@@ -129,9 +273,18 @@ class EventSubscription:
             user_id: Optional[Union[str, List[str]]] = None,
             channel_id: Optional[Union[str, List[str]]] = None,
             reaction: Optional[Union[str, List[str]]] = None,
+            text_pattern: Optional[Union[str, Pattern]] = None,
+            keywords: Optional[List[str]] = None,
             condition: callable = None,
             after: callable = None,
-            guard=False):
+            guard=False,
+            team_id: Optional[Union[str, List[str]]] = None,
+            enterprise_id: Optional[Union[str, List[str]]] = None,
+            timeout: Optional[float] = None,
+            circuit: Optional[CircuitBreaker] = None,
+            on_open: callable = None,
+            in_process_pool: bool = False,
+            middleware: Optional[Union[callable, List[callable]]] = None):
         """
         add function to receive Event Subscription.
         The name of the arguments of registered function must be `params`
@@ -141,11 +294,27 @@ class EventSubscription:
             user_id: filter with user_id such as `Uxxxxxxxx`.
             channel_id: filter with channel_id.
             reaction: filter with slack stamp-name.
+            text_pattern: filter with the regular expression searched in the text of the message.
+                Named groups and backreferences are not supported.
+            keywords: filter with any of the words in the text of the message, ignoring case.
             condition: additional condition whether the registered function is called.
             after: additional function with recieving the response of the function.
-            guard: if True, the registered function is always called.
+            guard: if True, the registered function is called when no function is registered to the event_type.
+            team_id: register only for the workspaces, such as `Txxxxxxxx`. Registered for all workspaces if None.
+            enterprise_id: register only for the workspaces in the Enterprise Grid organizations.
+            timeout: seconds to wait for the function in `execute_all`.
+            circuit: circuit breaker of the function and `after`, to fail fast while the dependency is failing.
+            on_open: function with `params` argument, called instead while the circuit is open,
+                such as the [guard] function. CircuitOpenError is raised if not set.
+            in_process_pool: if True, the function is called in a worker process, for CPU-heavy work.
+                It must be defined at the top level of a module, and the payload and its response must be picklable.
+                Conditions and `after` run in this process.
+            middleware: function receiving the next callable and returning the wrapped one, or list of them,
+                composed once around the function (with its cache, circuit and `after`). The first is the outermost.
 
-        Returns:
+        Raises:
+            DecoratorAddError: if [guard] is already set in the same workspace scope,
+                or another function without filters is already registered to the same scope and `event_type`.
 
         """
         def decorator(f):
@@ -157,6 +326,13 @@ class EventSubscription:
                 raise DecoratorAddError("argument [condition] must be callable")
             if not (callable(after) or after is None):
                 raise DecoratorAddError("argument [after] must be callable")
+            if timeout is not None and timeout <= 0:
+                raise DecoratorAddError("argument [timeout] must be positive")
+            if not (isinstance(circuit, CircuitBreaker) or circuit is None):
+                raise DecoratorAddError("argument [circuit] must be CircuitBreaker")
+            if on_open is not None and (not callable(on_open) or circuit is None):
+                raise DecoratorAddError("argument [on_open] must be callable, and set with [circuit]")
+            handler_middleware = self._middleware + to_middleware_tuple("middleware", middleware)
             condition_list = []
             if condition is not None:
                 condition_list.append(condition)
@@ -166,19 +342,45 @@ class EventSubscription:
                 condition_list.append(self._generate_matched_function(channel_id, self._get_channel_id_from))
             if reaction is not None:
                 condition_list.append(self._generate_matched_function(reaction, self._get_reaction_from))
-            executor_info = {
-                "app_name": self.app_name,
-                "event_type": event_type,
-                "conditions": condition_list,
-                "after": after,
-                "function": f,
-                "guard": guard
-            }
-            self._executor_list.append(executor_info)
+            # text filters are combined for all functions of the event_type, to scan the text once
+            text_patterns = []
+            if text_pattern is not None:
+                text_patterns.append(compile_text_pattern(text_pattern))
+            compiled_keywords = compile_keywords(keywords) if keywords is not None else None
+            handler = Handler(
+                app_name=self.app_name,
+                key=event_type,
+                conditions=tuple(condition_list),
+                after=after,
+                function=f,
+                guard=guard,
+                team_ids=to_id_set("team_id", team_id),
+                enterprise_ids=to_id_set("enterprise_id", enterprise_id),
+                text_patterns=tuple(text_patterns),
+                keywords=compiled_keywords,
+                timeout=timeout,
+                circuit=circuit,
+                on_open=on_open,
+                process_pool=self._process_pool if in_process_pool else None,
+                middleware=handler_middleware
+            )
+            self._registry.add(handler)
             return f
 
         return decorator
 
+    @property
+    def ignore_user_id_list(self) -> List[str]:
+        """
+        user_ids whose events are ignored. Changes of the list, such as `append`, are applied.
+        """
+        return self._ignore_user_id_list
+
+    @ignore_user_id_list.setter
+    def ignore_user_id_list(self, user_ids: List[str]):
+        self._ignore_user_id_list = _IgnoreUserIdList(self, user_ids)
+        self._ignore_user_id_list._changed()
+
     def add_ignore_user_id_list(self, user_id: str):
         """
         add ignore user list to avoid being invoked by the app-user
@@ -186,7 +388,78 @@ class EventSubscription:
         Args:
             user_id: app-user user_id is recommended.
         """
-        self.ignore_user_id_list.append(user_id)
+        if user_id not in self._ignore_user_ids:
+            self._ignore_user_id_list.append(user_id)
+
+    def add_ignore_bot_id(self, bot_id: str):
+        """
+        ignore events posted by the bot, such as the messages of the app itself.
+
+        Args:
+            bot_id: `bot_id` in the event, such as `Bxxxxxxxx`.
+        """
+        self._ignore_bot_ids.add(bot_id)
+
+    def add_ignore_subtype(self, subtype: str):
+        """
+        ignore events with the subtype, such as `message_changed`.
+        """
+        self._ignore_subtypes.add(subtype)
+
+    def _ignored_reason(self, params: dict) -> Optional[str]:
+        """
+        the reason to drop the payload before dispatching, None if not ignored.
+        """
+        if not (self._ignore_user_ids or self._ignore_bot_ids or self._ignore_subtypes):
+            return None
+        event = params.get("event")
+        if not isinstance(event, dict):
+            return None
+        if self._ignore_user_ids and (event.get("user") or event.get("user_id")) in self._ignore_user_ids:
+            return "user_id"
+        bot_id = event.get("bot_id")
+        if bot_id is not None and (self._ignore_bots or bot_id in self._ignore_bot_ids):
+            return "bot_id"
+        if event.get("subtype") in self._ignore_subtypes:
+            return "subtype"
+        return None
+
+    def _drop(self, params: dict) -> bool:
+        reason = self._ignored_reason(params)
+        if reason is None:
+            return False
+        with self._dropped_lock:
+            self._dropped[reason] += 1
+        return True
+
+    def dropped_counts(self) -> Dict[str, int]:
+        """
+        the number of events ignored by `add_ignore_user_id_list`, `add_ignore_bot_id` and `add_ignore_subtype`,
+        for each reason: `user_id`, `bot_id` or `subtype`.
+        """
+        with self._dropped_lock:
+            return dict(self._dropped)
+
+    def remove(self, function: callable) -> int:
+        """
+        unregister the function, without pausing `execute` running in other threads.
+
+        Returns:
+            the number of registrations removed.
+        """
+        return self._registry.remove(function)
+
+    def batch(self):
+        """
+        context manager to apply all `add` and `remove` in the block at once.
+        `execute` running in other threads sees either all of them or none of them.
+
+        Examples:
+            >>> with dispatcher.batch():
+            ...     dispatcher.remove(old_function)
+            ...     dispatcher.add(...)(new_function)
+        """
+        return self._registry.batch()
 
     def execute(self, params: dict):
         """
@@ -195,33 +468,129 @@ class EventSubscription:
             params: payload from Event Subscription of slack.
 
         Returns:
+            the response of the registered function, or of `after` if set.
+            None if the event is ignored.
+
+        Raises:
+            DecoratorExecuteError: if no function is found for the payload.
 
         """
+        if self._profiler is None:
+            return self._execute(params, None)
+        active = self._profiler.begin(self.app_name, params, self._summarize)
+        try:
+            return self._execute(params, active)
+        finally:
+            self._profiler.end(active)
+
+    def _execute(self, params: dict, active: Optional[ActiveDispatch]):
+        if self._tracer is not None:
+            record = self._tracer.start(self.app_name, "event_subscription")
+            if record is not None:
+                return self._tracer.run(record, self._dispatch, params, active=active)
+        return self._dispatch(params, None, active)
+
+    def _dispatch(self, params: dict, record: Optional[TraceRecord], active: Optional[ActiveDispatch]):
+        if self._drop(params):
+            if record is not None:
+                record.outcome = "dropped"
+            return None
         event_type = self._get_event_type_from(params=params)
-        functions = [v for v in self._executor_list if v['event_type'] == event_type]
-
-        if functions:
-            functions_with_condition = [v for v in functions if v['conditions']]
-            functions_pass_condition = [v for v in functions_with_condition
-                                        if all([f(params) for f in v['conditions']])]
-            functions_as_guard = [v for v in functions if not v['conditions']]
-            if len(functions_pass_condition) == 1:
-                target = functions_pass_condition[0]
-            else:
-                if len(functions_as_guard) == 1:
-                    target = functions_as_guard[0]
-                else:
-                    raise DecoratorExecuteError("cannot set multiple [guard]")
+        if record is not None:
+            record.key = event_type
+            record.team_id = self._get_team_id_from(params)
+        target = self._router_for(params).resolve(event_type, params, record)
+        if active is not None:
+            active.handler = target.name
+        return target(params)
 
-        else:
-            guard = [v for v in self._executor_list if v['guard']]
-            if len(guard) == 1:
-                target = guard[0]
-            else:
-                raise DecoratorExecuteError("cannot set multiple [guard]")
-
-        target_function = target['function']
-        after_function = target['after']
-        if after_function is not None:
-            return after_function(target_function(params=params))
-        return target_function(params=params)
+    @staticmethod
+    def _summarize(params: dict) -> dict:
+        """
+        summary of the payload for slow dispatch samples, without the text itself
+        """
+        event = params.get("event")
+        event = event if isinstance(event, dict) else {}
+        item = event.get("item") if isinstance(event.get("item"), dict) else {}
+        return {
+            "event_type": event.get("type"),
+            "event_id": params.get("event_id"),
+            "team_id": params.get("team_id"),
+            "channel": event.get("channel") or item.get("channel"),
+            "user": event.get("user") or event.get("user_id"),
+            "text_length": len(event.get("text") or ""),
+        }
+
+    def enqueue(self, params: dict) -> int:
+        """
+        put the payload to the `queue` to execute it later in `QueueWorker`,
+        so that the request from slack can be acked immediately.
+
+        Args:
+            params: payload from Event Subscription of slack.
+
+        Returns:
+            message_id in the queue, None if the event is ignored.
+
+        Raises:
+            DecoratorExecuteError: if `queue` is not set.
+            SlackParameterNotFoundError: if the payload has no event type.
+        """
+        if self.queue is None:
+            raise DecoratorExecuteError("[queue] is not set")
+        if self._drop(params):
+            return None
+        # validate at ingest, not to put a payload which never succeeds
+        self._get_event_type_from(params=params)
+        return self.queue.put(params)
+
+    def execute_all(self, params: dict, timeout: Optional[float] = None) -> List[HandlerResult]:
+        """
+        fan-out mode: call all functions whose conditions pass concurrently,
+        functions without filters are always called.
+        The total latency is the one of the slowest function, instead of the sum.
+
+        Args:
+            params: payload from Event Subscription of slack.
+            timeout: seconds to wait for functions registered without `timeout`. None waits without limit.
+
+        Returns:
+            list of HandlerResult in registration order, empty if the event is ignored.
+            Errors raised in the functions are stored in `HandlerResult.error`, not raised.
+
+        Raises:
+            DecoratorExecuteError: if no function is registered to the event_type and no [guard] is set.
+        """
+        if self._drop(params):
+            return []
+        event_type = self._get_event_type_from(params=params)
+        targets = self._router_for(params).resolve_all(event_type, params)
+        if not targets:
+            return []
+        return run_all(targets, params, pool=self._get_pool(), timeout=timeout)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        pool = self._pool
+        if pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                    thread_name_prefix=f"{self.app_name}-fan-out")
+                pool = self._pool
+        return pool
+
+    def circuit_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        `CircuitBreaker.snapshot` of each function registered with [circuit], by its qualified name.
+        """
+        return {v.name: v.circuit.snapshot() for v in self._registry.handlers if v.circuit is not None}
+
+    def close(self):
+        """
+        shutdown threads started by `execute_all`, and worker processes for `in_process_pool`.
+        """
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+        self._process_pool.shutdown(wait=True)
@@ -0,0 +1,290 @@
+"""
+backfill a Slack export archive through `EventSubscription`, without loading the files into memory.
+
+    $ python -m slack_api_decorator.export app:event_subscription ./export --team-id Txxxxxxxx --concurrency 4
+
+The export directory has metadata files such as `channels.json`,
+and a folder for each channel with a JSON array of messages for each day, such as `general/2020-01-31.json`.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from .error import SlackApiDecoratorException
+from .event_subscription import EventSubscription
+from .replay import import_dispatcher
+
+logger = logging.getLogger(__name__)
+
+# metadata files of the export, with the channels in the folders
+METADATA_FILES = ("channels.json", "groups.json", "mpims.json", "dms.json")
+_WHITESPACE = " \t\n\r"
+# characters which can continue a number, such as `1` followed by `.5` in the next chunk
+_NUMBER_CONTINUATION = "0123456789.eE+-"
+
+
+def iter_json_array(f: TextIO, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """
+    yield the elements of the JSON array in the file one by one,
+    reading `chunk_size` characters at a time instead of the whole file.
+
+    Raises:
+        SlackApiDecoratorException: if the file is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        # drop the consumed part, so that the buffer holds at most a chunk and an element
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def skip_whitespace() -> bool:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer) or not fill():
+                return position < len(buffer)
+
+    if not skip_whitespace() or buffer[position] != "[":
+        raise SlackApiDecoratorException("the file must be a JSON array")
+    position += 1
+    first = True
+    while True:
+        if not skip_whitespace():
+            raise SlackApiDecoratorException("the JSON array is not closed")
+        if buffer[position] == "]":
+            return
+        if not first:
+            if buffer[position] != ",":
+                raise SlackApiDecoratorException(f"expected [,] in the JSON array, got [{buffer[position]}]")
+            position += 1
+            if not skip_whitespace():
+                raise SlackApiDecoratorException("the JSON array is not closed")
+        first = False
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                # the element continues in the next chunk
+                if not eof and fill():
+                    continue
+                raise SlackApiDecoratorException(f"invalid JSON in the array: {e}")
+            # a number at the end of the buffer, or followed by a part of a number, may continue in the next chunk
+            is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if is_number and (end == len(buffer) or buffer[end] in _NUMBER_CONTINUATION) and not eof and fill():
+                continue
+            break
+        position = end
+        yield value
+
+
+def load_channel_ids(directory: str) -> Dict[str, str]:
+    """
+    folder name -> channel id, from the metadata files of the export.
+    Folders of direct messages are named by the id.
+    """
+    channel_ids = {}
+    for name in METADATA_FILES:
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for channel in iter_json_array(f):
+                if isinstance(channel, dict) and channel.get("id"):
+                    channel_ids[channel.get("name") or channel["id"]] = channel["id"]
+    return channel_ids
+
+
+def iter_export_files(directory: str, channels: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, str]]:
+    """
+    yield (channel_id, path) of the daily files of the export, channel by channel and day by day.
+
+    Args:
+        directory: the extracted export.
+        channels: names of the channel folders to read, all channels if None.
+    """
+    if not os.path.isdir(directory):
+        raise SlackApiDecoratorException(f"[{directory}] is not a directory")
+    channel_ids = load_channel_ids(directory)
+    names = sorted(v for v in os.listdir(directory) if os.path.isdir(os.path.join(directory, v)))
+    if channels is not None:
+        channels = set(channels)
+        names = [v for v in names if v in channels]
+    for name in names:
+        folder = os.path.join(directory, name)
+        for file_name in sorted(v for v in os.listdir(folder) if v.endswith(".json")):
+            yield channel_ids.get(name, name), os.path.join(folder, file_name)
+
+
+def iter_file_messages(path: str) -> Iterator[dict]:
+    """
+    yield the messages of a daily file lazily.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for message in iter_json_array(f):
+            if isinstance(message, dict):
+                yield message
+
+
+def to_event_payload(message: dict, channel_id: str, team_id: Optional[str] = None) -> dict:
+    """
+    wrap a message of the export into the payload of the `message` event, as slack sends it.
+    The event_id is `backfill:{channel_id}:{ts}`, so that handlers can tell backfilled events.
+    """
+    event = dict(message)
+    event.setdefault("type", "message")
+    event["channel"] = channel_id
+    ts = str(message.get("ts", ""))
+    try:
+        event_time = int(float(ts))
+    except ValueError:
+        event_time = 0
+    return {
+        "token": None,
+        "team_id": team_id or message.get("team"),
+        "event": event,
+        "type": "event_callback",
+        "event_id": f"backfill:{channel_id}:{ts}",
+        "event_time": event_time,
+    }
+
+
+class ExportProgress:
+    """
+    progress of `ingest_export`.
+
+    Attributes:
+        files: the number of daily files started.
+        messages: the number of messages executed.
+        errors: the number of messages whose `execute` raised.
+        elapsed: seconds from the start.
+    """
+    __slots__ = ("files", "messages", "errors", "elapsed")
+
+    def __init__(self):
+        self.files = 0
+        self.messages = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        messages per second.
+        """
+        if self.elapsed <= 0:
+            return 0.0
+        return self.messages / self.elapsed
+
+    def format(self) -> str:
+        return (f"{self.files} files, {self.messages} messages, {self.errors} errors, "
+                f"{self.elapsed:.3f} s, {self.throughput:.1f} messages/s")
+
+    def __repr__(self):
+        return f"ExportProgress({self.format()})"
+
+
+def ingest_export(event_subscription: EventSubscription,
+                  directory: str,
+                  team_id: Optional[str] = None,
+                  channels: Optional[Iterable[str]] = None,
+                  batch_size: int = 100,
+                  concurrency: int = 1,
+                  progress: Optional[callable] = None,
+                  progress_interval: float = 0.0,
+                  clock: callable = time.perf_counter) -> ExportProgress:
+    """
+    execute the messages of the export in batches, holding at most `batch_size` messages in memory.
+    Errors raised in the functions are logged and counted, not raised.
+
+    Args:
+        event_subscription: dispatcher to execute the payloads.
+        directory: the extracted export.
+        team_id: team_id of the payloads, `team` of each message if None.
+        channels: names of the channel folders to read, all channels if None.
+        batch_size: the number of messages read before executing them.
+        concurrency: the number of threads to execute a batch. Messages of a batch may finish out of order.
+        progress: function called with ExportProgress after each batch.
+        progress_interval: minimum seconds between calls of `progress`.
+        clock: clock in seconds.
+
+    Returns:
+        ExportProgress at the end.
+    """
+    if batch_size <= 0 or concurrency <= 0:
+        raise SlackApiDecoratorException("[batch_size] and [concurrency] must be positive")
+    report = ExportProgress()
+    started = clock()
+    last_reported = [started - progress_interval]
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="export") if concurrency > 1 else None
+
+    def execute(params: dict) -> bool:
+        try:
+            event_subscription.execute(params)
+            return True
+        except Exception:
+            logger.exception(f"failed to execute [{params['event_id']}]")
+            return False
+
+    def run(batch: List[dict]):
+        results = pool.map(execute, batch) if pool is not None else map(execute, batch)
+        for ok in results:
+            report.messages += 1
+            report.errors += not ok
+        now = clock()
+        report.elapsed = now - started
+        if progress is not None and now - last_reported[0] >= progress_interval:
+            last_reported[0] = now
+            progress(report)
+
+    batch = []
+    try:
+        for channel_id, path in iter_export_files(directory, channels=channels):
+            report.files += 1
+            for message in iter_file_messages(path):
+                batch.append(to_event_payload(message, channel_id, team_id))
+                if len(batch) >= batch_size:
+                    run(batch)
+                    batch = []
+        if batch:
+            run(batch)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+    report.elapsed = clock() - started
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="backfill a slack export through EventSubscription")
+    parser.add_argument("dispatcher", help="`module:attribute` of EventSubscription")
+    parser.add_argument("directory", help="the extracted export")
+    parser.add_argument("--team-id", default=None, help="team_id of the payloads")
+    parser.add_argument("--channel", action="append", default=None, help="channel folder to read, repeatable")
+    parser.add_argument("--batch-size", type=int, default=100, help="the number of messages in memory")
+    parser.add_argument("--concurrency", type=int, default=1, help="the number of threads")
+    args = parser.parse_args(argv)
+
+    report = ingest_export(import_dispatcher(args.dispatcher), args.directory, team_id=args.team_id,
+                           channels=args.channel, batch_size=args.batch_size, concurrency=args.concurrency,
+                           progress=lambda v: print(v.format(), file=sys.stderr), progress_interval=1.0)
+    print(report.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import time
+from concurrent.futures import Executor, TimeoutError
+from typing import Any, List, Optional
+
+from .handler import Handler
+
+
+class HandlerResult:
+    """
+    result of one handler called in fan-out mode.
+
+    Attributes:
+        name: qualified name of the registered function.
+        result: the response of the function, or of `after` if set. None if failed or timed out.
+        error: the exception raised by the function or `after`.
+        timed_out: True if the handler did not finish within its timeout.
+        elapsed: seconds the handler took, or the timeout if timed out.
+    """
+    __slots__ = ("name", "result", "error", "timed_out", "elapsed")
+
+    def __init__(self,
+                 name: str,
+                 result: Any = None,
+                 error: Optional[BaseException] = None,
+                 timed_out: bool = False,
+                 elapsed: float = 0.0):
+        self.name = name
+        self.result = result
+        self.error = error
+        self.timed_out = timed_out
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.timed_out
+
+    def __repr__(self):
+        return (f"HandlerResult(name={self.name!r}, ok={self.ok}, "
+                f"timed_out={self.timed_out}, elapsed={self.elapsed:.3f})")
+
+
+def run_all(handlers: List[Handler],
+            params: dict,
+            pool: Executor,
+            timeout: Optional[float] = None,
+            clock: callable = time.monotonic) -> List[HandlerResult]:
+    """
+    call all handlers concurrently in the `pool`, and collect their results in registration order.
+    Handlers which do not finish within their timeout are reported as timed out,
+    they keep running in the pool since a running thread cannot be stopped.
+
+    Args:
+        handlers: handlers to call.
+        params: payload passed to each handler.
+        pool: executor to run the handlers.
+        timeout: default seconds for handlers without `timeout`. None waits without limit.
+        clock: monotonic clock in seconds.
+
+    Returns:
+        list of HandlerResult, in the same order as `handlers`.
+    """
+    def call(handler: Handler):
+        handler_started = clock()
+        try:
+            return handler(params), None, clock() - handler_started
+        except Exception as e:
+            return None, e, clock() - handler_started
+
+    started = clock()
+    futures = [pool.submit(call, v) for v in handlers]
+
+    def deadline_of(handler: Handler) -> Optional[float]:
+        handler_timeout = handler.timeout if handler.timeout is not None else timeout
+        return None if handler_timeout is None else started + handler_timeout
+
+    results: List[Optional[HandlerResult]] = [None] * len(handlers)
+    # collect the handlers with the earliest deadline first, so that each waits only for its own budget
+    order = sorted(range(len(handlers)),
+                   key=lambda i: (deadline_of(handlers[i]) is None, deadline_of(handlers[i]) or 0.0))
+    for i in order:
+        handler, future = handlers[i], futures[i]
+        deadline = deadline_of(handler)
+        remaining = None if deadline is None else max(0.0, deadline - clock())
+        try:
+            result, error, elapsed = future.result(timeout=remaining)
+        except TimeoutError:
+            future.cancel()
+            results[i] = HandlerResult(name=handler.name, timed_out=True, elapsed=clock() - started)
+        else:
+            results[i] = HandlerResult(name=handler.name, result=result, error=error, elapsed=elapsed)
+    return results
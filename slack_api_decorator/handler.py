@@ -0,0 +1,197 @@
+import threading
+from inspect import signature
+from typing import FrozenSet, List, Optional, Pattern, Tuple, Union
+
+from .cache import ResponseCache
+from .circuit import CircuitBreaker
+from .error import CircuitOpenError, DecoratorAddError
+from .middleware import compose
+from .process_pool import ProcessPool, import_path_of
+from .text_matcher import TextKey, keywords_key, pattern_key
+
+# remaining seconds of the deadline, while calling the middleware of the handler
+_budget = threading.local()
+# shared by the handlers without `text_pattern` and `keywords`, instead of an empty frozenset each
+_NO_TEXT_KEYS: FrozenSet[TextKey] = frozenset()
+
+
+class Handler:
+    """
+    registered function with its filters.
+    Shared by `EventSubscription` and `SlashCommand`,
+    `key` is the event_type or the command the function is registered to.
+
+    Uses ``__slots__`` instead of a dict per registration,
+    so that thousands of handlers stay compact and attribute access is cheap while dispatching.
+    """
+    __slots__ = ("app_name", "key", "conditions", "after", "function", "guard", "timeout",
+                 "deadline", "on_timeout", "accepts_remaining", "team_ids", "enterprise_ids",
+                 "text_patterns", "keywords", "text_keys", "cache", "circuit", "on_open",
+                 "process_pool", "import_path", "middleware", "entry")
+
+    def __init__(self,
+                 app_name: str,
+                 key: str,
+                 conditions: Tuple[callable, ...],
+                 after: Optional[callable],
+                 function: callable,
+                 guard: bool,
+                 timeout: Optional[float] = None,
+                 deadline: Optional[float] = None,
+                 on_timeout: Optional[callable] = None,
+                 team_ids: Optional[FrozenSet[str]] = None,
+                 enterprise_ids: Optional[FrozenSet[str]] = None,
+                 text_patterns: Tuple[Pattern, ...] = (),
+                 keywords: Optional[FrozenSet[str]] = None,
+                 cache: Optional[ResponseCache] = None,
+                 circuit: Optional[CircuitBreaker] = None,
+                 on_open: Optional[callable] = None,
+                 process_pool: Optional[ProcessPool] = None,
+                 middleware: Tuple[callable, ...] = ()):
+        self.app_name = app_name
+        self.key = key
+        self.conditions = tuple(conditions)
+        self.after = after
+        self.function = function
+        self.guard = guard
+        self.timeout = timeout
+        self.deadline = deadline
+        self.on_timeout = on_timeout
+        # the remaining budget is passed only to functions with the `remaining` argument
+        self.accepts_remaining = deadline is not None and "remaining" in signature(function).parameters
+        # None for handlers shared by all workspaces
+        self.team_ids = team_ids
+        self.enterprise_ids = enterprise_ids
+        # matched against the text once for all handlers, see `TextMatcher`
+        self.text_patterns = tuple(text_patterns)
+        self.keywords = keywords
+        text_keys = [pattern_key(v) for v in self.text_patterns]
+        if keywords:
+            text_keys.append(keywords_key(keywords))
+        self.text_keys = frozenset(text_keys) if text_keys else _NO_TEXT_KEYS
+        # the response of the function is cached, `after` is called every time
+        self.cache = cache
+        # the function and `after` are called through the circuit, `on_open` is called instead while it is open
+        self.circuit = circuit
+        self.on_open = on_open
+        # the function is called in the worker process by its import path, the rest runs in this process
+        self.process_pool = process_pool
+        self.import_path = import_path_of(function) if process_pool is not None else None
+        # composed once here, None calls the handler directly
+        self.middleware = tuple(middleware)
+        self.entry = compose(self.middleware, self._call_from_middleware) if self.middleware else None
+
+    @property
+    def name(self) -> str:
+        return getattr(self.function, "__qualname__", repr(self.function))
+
+    @property
+    def scope_rank(self) -> int:
+        """
+        precedence of the scope: 2 for team, 1 for enterprise, 0 for all workspaces.
+        """
+        if self.team_ids:
+            return 2
+        if self.enterprise_ids:
+            return 1
+        return 0
+
+    @property
+    def has_filters(self) -> bool:
+        return bool(self.conditions or self.text_keys)
+
+    def match(self, params: dict, matched_texts: FrozenSet[TextKey] = frozenset()) -> bool:
+        """
+        whether all conditions pass, stops at the first failing condition.
+
+        Args:
+            params: payload from slack.
+            matched_texts: keys of the text patterns and keywords matched in the payload, from `TextMatcher.scan`.
+        """
+        if self.text_keys and not self.text_keys <= matched_texts:
+            return False
+        for condition in self.conditions:
+            if not condition(params):
+                return False
+        return True
+
+    def __call__(self, params: dict):
+        if self.entry is not None:
+            return self.entry(params)
+        if self.circuit is not None:
+            return self._call_through_circuit(params, None)
+        return self._call(params, None)
+
+    def call_with_budget(self, params: dict, remaining: float):
+        """
+        call the function with the remaining seconds of its `deadline`.
+        """
+        if self.entry is not None:
+            # passed through the middleware in the same thread, not to recompose the chain per request
+            _budget.remaining = remaining
+            try:
+                return self.entry(params)
+            finally:
+                _budget.remaining = None
+        if self.circuit is not None:
+            return self._call_through_circuit(params, remaining)
+        return self._call(params, remaining)
+
+    def _call_from_middleware(self, params: dict):
+        remaining = getattr(_budget, "remaining", None)
+        if self.circuit is not None:
+            return self._call_through_circuit(params, remaining)
+        return self._call(params, remaining)
+
+    def _call_function(self, params: dict, remaining: Optional[float]):
+        if self.process_pool is not None:
+            return self.process_pool.call(self.import_path, params)
+        if self.accepts_remaining:
+            return self.function(params=params, remaining=remaining)
+        return self.function(params=params)
+
+    def _call(self, params: dict, remaining: Optional[float]):
+        if self.cache is not None:
+            result = self.cache.get_or_compute(params, lambda: self._call_function(params, remaining))
+        else:
+            result = self._call_function(params, remaining)
+        if self.after is None:
+            return result
+        return self.after(result)
+
+    def _call_through_circuit(self, params: dict, remaining: Optional[float]):
+        circuit = self.circuit
+        if not circuit.allow():
+            if self.on_open is None:
+                raise CircuitOpenError(self.name)
+            return self.on_open(params=params)
+        started = circuit.clock()
+        failed = True
+        try:
+            result = self._call(params, remaining)
+            failed = False
+            return result
+        except circuit.failure_types:
+            raise
+        except BaseException:
+            # not a failure of the dependency, such as a validation error
+            failed = None
+            raise
+        finally:
+            circuit.record(circuit.clock() - started, failed=failed)
+
+    def __repr__(self):
+        return f"Handler(key={self.key!r}, function={self.name}, guard={self.guard})"
+
+
+def to_id_set(name: str, value: Optional[Union[str, List[str]]]) -> Optional[FrozenSet[str]]:
+    """
+    convert the `team_id` or `enterprise_id` argument of `add` to the scope of the handler.
+    """
+    if value is None:
+        return None
+    if type(value) is str:
+        return frozenset([value])
+    if type(value) is list and value and all([type(v) is str for v in value]):
+        return frozenset(value)
+    raise DecoratorAddError(f"argument [{name}] must be str or non-empty list of str")
@@ -0,0 +1,47 @@
+from typing import Iterable, Tuple
+
+from .error import DecoratorAddError
+
+
+def to_middleware_tuple(name: str, value) -> Tuple[callable, ...]:
+    """
+    convert the `middleware` argument of the dispatchers and `add` to a tuple.
+    """
+    if value is None:
+        return ()
+    if callable(value):
+        return (value,)
+    value = tuple(value)
+    if not all([callable(v) for v in value]):
+        raise DecoratorAddError(f"argument [{name}] must be callable or list of callable")
+    return value
+
+
+def compose(middleware: Iterable[callable], core: callable) -> callable:
+    """
+    compose middleware around `core` once, into a single callable with `params` argument.
+    Each middleware receives the next callable and returns the wrapped one,
+    so that a request costs one function call per layer, without resolving the chain again.
+    The first middleware is the outermost.
+
+    Examples:
+        >>> def log_errors(call_next):
+        ...     def middleware(params):
+        ...         try:
+        ...             return call_next(params)
+        ...         except Exception:
+        ...             logger.exception("failed")
+        ...             raise
+        ...     return middleware
+        >>> entry = compose([log_errors], handler)
+        >>> entry(payload_from_slack)
+
+    Raises:
+        DecoratorAddError: if a middleware does not return a callable.
+    """
+    entry = core
+    for layer in reversed(tuple(middleware)):
+        entry = layer(entry)
+        if not callable(entry):
+            raise DecoratorAddError(f"middleware [{getattr(layer, '__qualname__', layer)}] must return callable")
+    return entry
@@ -0,0 +1,120 @@
+import queue
+import threading
+import zlib
+from concurrent.futures import Future
+from typing import List, Optional
+
+from .error import DecoratorExecuteError, PartitionFullError, SlackApiDecoratorException
+from .event_subscription import EventSubscription
+
+# stops the worker thread of a partition
+_STOP = object()
+
+
+class PartitionedExecutor:
+    """
+    execute payloads of EventSubscription concurrently, keeping the order per channel (or user).
+    Payloads with the same key are hashed to the same partition, which has one worker thread,
+    so they are executed in the order submitted, while other partitions run in parallel.
+    Each partition has a bounded queue, `submit` blocks when it is full.
+
+    Examples:
+        >>> executor = PartitionedExecutor(event_subscription, partitions=8, key="channel")
+        >>> future = executor.submit(payload_from_slack)
+        >>> future.result()
+    """
+
+    def __init__(self,
+                 event_subscription: EventSubscription,
+                 partitions: int = 4,
+                 key: str = "channel",
+                 max_queue_size: int = 100):
+        """
+
+        Args:
+            event_subscription: dispatcher to execute payloads.
+            partitions: the number of partitions, and of worker threads.
+            key: `channel` or `user`, to partition payloads.
+                Payloads without the key are executed in the first partition.
+            max_queue_size: the number of payloads waiting in each partition.
+        """
+        if partitions <= 0 or max_queue_size <= 0:
+            raise SlackApiDecoratorException("[partitions] and [max_queue_size] must be positive")
+        if key == "channel":
+            self._key_function = EventSubscription._get_channel_id_from
+        elif key == "user":
+            self._key_function = EventSubscription._get_user_id_from
+        else:
+            raise SlackApiDecoratorException(f"[key] must be `channel` or `user`, got [{key}]")
+        self.event_subscription = event_subscription
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=max_queue_size) for _ in range(partitions)]
+        self._threads = [
+            threading.Thread(target=self._work, args=(v,), name=f"{event_subscription.app_name}-partition-{i}",
+                             daemon=True)
+            for i, v in enumerate(self._queues)
+        ]
+        self._closed = False
+        for thread in self._threads:
+            thread.start()
+
+    def partition_of(self, params: dict) -> int:
+        """
+        index of the partition for the payload, stable across processes.
+        """
+        try:
+            key = self._key_function(params)
+        except SlackApiDecoratorException:
+            key = None
+        if not key:
+            return 0
+        return zlib.crc32(str(key).encode("utf-8")) % len(self._queues)
+
+    def submit(self, params: dict, timeout: Optional[float] = None) -> Future:
+        """
+        add the payload to its partition.
+
+        Args:
+            params: payload from Event Subscription of slack.
+            timeout: seconds to wait while the partition is full. None waits without limit.
+
+        Returns:
+            Future of the response of `execute`.
+
+        Raises:
+            PartitionFullError: if the partition is still full after `timeout`.
+        """
+        if self._closed:
+            raise DecoratorExecuteError("executor is already shutdown")
+        partition = self.partition_of(params)
+        future = Future()
+        try:
+            self._queues[partition].put((params, future), timeout=timeout)
+        except queue.Full:
+            raise PartitionFullError(partition)
+        return future
+
+    def _work(self, partition_queue: queue.Queue):
+        while True:
+            item = partition_queue.get()
+            if item is _STOP:
+                return
+            params, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.event_subscription.execute(params))
+            except Exception as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait: bool = True):
+        """
+        stop the workers after the payloads already submitted are executed.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for partition_queue in self._queues:
+            partition_queue.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,99 @@
+import importlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Optional
+
+from .error import DecoratorAddError
+
+
+def import_path_of(function: callable) -> str:
+    """
+    `module:qualname` of the function, to import it in the worker process.
+
+    Raises:
+        DecoratorAddError: if the function is not defined at the top level of a module, such as a lambda.
+    """
+    module = getattr(function, "__module__", None)
+    qualname = getattr(function, "__qualname__", None)
+    if not module or not qualname or "<" in qualname:
+        raise DecoratorAddError(
+            f"function [{getattr(function, '__name__', function)}] must be defined at the top level of a module "
+            f"to be called in the process pool")
+    return f"{module}:{qualname}"
+
+
+@lru_cache(maxsize=None)
+def _resolve(path: str) -> callable:
+    module_name, qualname = path.split(":", 1)
+    target = importlib.import_module(module_name)
+    for attribute in qualname.split("."):
+        target = getattr(target, attribute)
+    return target
+
+
+def _call_in_worker(path: str, params: dict) -> Any:
+    # the function is imported once per worker process, only the path and the payload are pickled per call
+    return _resolve(path)(params=params)
+
+
+class ProcessPool:
+    """
+    process pool to call CPU-heavy functions outside the GIL of the dispatcher.
+    The pool is started on the first call, and restarted after a worker process dies.
+
+    Functions are sent as their import path and imported in the worker,
+    so that the registered function (and `after`, which runs in the parent) need not be picklable.
+    The payload and the response must be picklable.
+
+    Worker processes are started with `forkserver` where it is available, and `spawn` otherwise,
+    since forking the dispatcher, which runs threads of the pools and the profiler,
+    can deadlock on the locks held by those threads.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, mp_context=None):
+        """
+
+        Args:
+            max_workers: the number of worker processes, the number of CPUs if None.
+            mp_context: multiprocessing context, such as `multiprocessing.get_context("spawn")`.
+                `forkserver`, or `spawn` where it is not available, if None.
+        """
+        if mp_context is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            mp_context = multiprocessing.get_context(method)
+        self.max_workers = max_workers
+        self.mp_context = mp_context
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        executor = self._executor
+        if executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self.mp_context)
+                executor = self._executor
+        return executor
+
+    def call(self, path: str, params: dict) -> Any:
+        """
+        call the function of the import path with the payload in a worker process, and wait for the response.
+        The calling thread releases the GIL while waiting, so that other events are dispatched meanwhile.
+        """
+        executor = self._get_executor()
+        try:
+            return executor.submit(_call_in_worker, path, params).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
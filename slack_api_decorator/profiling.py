@@ -0,0 +1,205 @@
+import json
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+from .error import SlackApiDecoratorException
+
+
+class ActiveDispatch:
+    """
+    a dispatch being watched by `SlowDispatchProfiler`.
+    """
+    __slots__ = ("app_name", "params", "summarize", "handler", "thread_id", "started", "stacks")
+
+    def __init__(self, app_name: str, params: dict, summarize: callable, started: float):
+        self.app_name = app_name
+        self.params = params
+        self.summarize = summarize
+        self.handler: Optional[str] = None
+        self.thread_id = threading.get_ident()
+        self.started = started
+        self.stacks: Counter = Counter()
+
+
+class SlowDispatchSample:
+    """
+    a dispatch which took longer than the threshold.
+
+    Attributes:
+        app_name: app_name of the dispatcher.
+        handler: qualified name of the called function, None if failed before it was chosen.
+        summary: summary of the payload, such as event_type, team_id, channel and user.
+        elapsed: seconds of the dispatch.
+        stacks: (stack, count) sampled while the dispatch was over the threshold, the most frequent first.
+            Each stack is ``file:line function`` frames joined with `` <- ``, the innermost first.
+    """
+    __slots__ = ("app_name", "handler", "summary", "elapsed", "stacks")
+
+    def __init__(self, app_name: str, handler: Optional[str], summary: Dict[str, Any], elapsed: float,
+                 stacks: List[tuple]):
+        self.app_name = app_name
+        self.handler = handler
+        self.summary = summary
+        self.elapsed = elapsed
+        self.stacks = stacks
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "app_name": self.app_name,
+            "handler": self.handler,
+            "summary": self.summary,
+            "elapsed": self.elapsed,
+            "stacks": [{"stack": stack, "count": count} for stack, count in self.stacks],
+        }
+
+
+def _format_stack(frame, limit: int) -> str:
+    frames = []
+    while frame is not None and len(frames) < limit:
+        code = frame.f_code
+        frames.append(f"{code.co_filename}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    return " <- ".join(frames)
+
+
+class SlowDispatchProfiler:
+    """
+    capture stack samples of dispatches slower than `threshold`.
+    A background thread samples the stack of the dispatching thread only while the dispatch is over the threshold,
+    so that faster dispatches cost only a dict insert and delete.
+    The thread sleeps until the earliest running dispatch crosses the threshold, and while none is running.
+    Slow dispatches are kept in a ring buffer of `capacity`, and can be dumped on demand.
+
+    Examples:
+        >>> profiler = SlowDispatchProfiler(threshold=1.0)
+        >>> es = EventSubscription("sample", profiler=profiler)
+        >>> print(profiler.dump())
+    """
+
+    def __init__(self,
+                 threshold: float,
+                 capacity: int = 100,
+                 interval: float = 0.01,
+                 stack_limit: int = 30,
+                 clock: callable = time.monotonic):
+        """
+
+        Args:
+            threshold: seconds, dispatches longer than this are recorded.
+            capacity: the number of slow dispatches kept, the oldest is discarded.
+            interval: seconds between stack samples.
+            stack_limit: the number of frames in a stack sample.
+            clock: monotonic clock in seconds.
+        """
+        if threshold <= 0 or capacity <= 0 or interval <= 0:
+            raise SlackApiDecoratorException("[threshold], [capacity] and [interval] must be positive")
+        self.threshold = threshold
+        self.interval = interval
+        self.stack_limit = stack_limit
+        self._clock = clock
+        self._samples = deque(maxlen=capacity)
+        self._active: Dict[int, ActiveDispatch] = {}
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # set by `begin` to wake the sampler, only while it waits for a dispatch
+        self._wakeup = threading.Event()
+        self._idle = False
+
+    def begin(self, app_name: str, params: dict, summarize: callable) -> ActiveDispatch:
+        """
+        start watching a dispatch.
+
+        Args:
+            app_name: app_name of the dispatcher.
+            params: payload from slack.
+            summarize: function to summarize the payload, called only if the dispatch is slow.
+        """
+        if self._sampler is None:
+            self._start_sampler()
+        active = ActiveDispatch(app_name=app_name, params=params, summarize=summarize, started=self._clock())
+        self._active[id(active)] = active
+        if self._idle:
+            self._idle = False
+            self._wakeup.set()
+        return active
+
+    def end(self, active: ActiveDispatch):
+        """
+        stop watching the dispatch, and record it if slow.
+        """
+        elapsed = self._clock() - active.started
+        self._active.pop(id(active), None)
+        if elapsed < self.threshold:
+            return
+        try:
+            summary = active.summarize(active.params)
+        except Exception as e:
+            summary = {"error": repr(e)}
+        with self._lock:
+            stacks = active.stacks.most_common()
+        self._samples.append(SlowDispatchSample(app_name=active.app_name, handler=active.handler,
+                                                summary=summary, elapsed=elapsed, stacks=stacks))
+
+    def _start_sampler(self):
+        with self._lock:
+            if self._sampler is not None:
+                return
+            self._sampler = threading.Thread(target=self._sample_loop, name="slow-dispatch-profiler", daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self):
+        while not self._stop.is_set():
+            running = list(self._active.values())
+            if not running:
+                # `begin` sets the event after this, if it adds a dispatch after the check below
+                self._wakeup.clear()
+                self._idle = True
+                if not self._active:
+                    self._wakeup.wait()
+                self._idle = False
+                continue
+            now = self._clock()
+            earliest = min([v.started for v in running])
+            if earliest + self.threshold > now:
+                self._stop.wait(max(self.interval, earliest + self.threshold - now))
+                continue
+            deadline = now - self.threshold
+            slow = [v for v in running if v.started <= deadline]
+            frames = sys._current_frames()
+            with self._lock:
+                for active in slow:
+                    frame = frames.get(active.thread_id)
+                    if frame is not None:
+                        active.stacks[_format_stack(frame, self.stack_limit)] += 1
+            self._stop.wait(self.interval)
+
+    def samples(self) -> List[SlowDispatchSample]:
+        """
+        slow dispatches in the ring buffer, the oldest first.
+        """
+        return list(self._samples)
+
+    def dump(self, clear: bool = False) -> str:
+        """
+        slow dispatches in the ring buffer as JSON lines.
+
+        Args:
+            clear: if True, the ring buffer is emptied.
+        """
+        samples = self.samples()
+        if clear:
+            self._samples.clear()
+        return "\n".join([json.dumps(v.to_dict(), ensure_ascii=False, default=str) for v in samples])
+
+    def close(self):
+        """
+        stop the sampling thread.
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._sampler is not None:
+            self._sampler.join()
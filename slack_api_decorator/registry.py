@@ -0,0 +1,506 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from itertools import chain
+from typing import Collection, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .error import DecoratorAddError, DecoratorExecuteError
+from .handler import Handler
+from .text_matcher import TextKey, TextMatcher
+from .tracing import TraceRecord
+
+
+class Route:
+    """
+    precomputed resolution for one event_type or command.
+
+    Attributes:
+        single: the handler always called, when it is the only one registered to the key.
+        conditional: handlers with conditions, the most specific scope first, in registration order within a scope.
+        fallback: the unique handler without conditions, called when not exactly one conditional handler passes.
+        handlers: all handlers of the key, in registration order.
+        matcher: text patterns and keywords of the handlers combined, None if no handler has them.
+        base: route of the handlers for all workspaces, when this route has only the handlers of a workspace.
+            Its conditional handlers are checked after the ones of this route,
+            and its fallback is used when this route has none.
+        insert_at: for each of `handlers`, its index among the handlers of `base` in registration order.
+    """
+    __slots__ = ("single", "conditional", "fallback", "handlers", "matcher", "base", "insert_at")
+
+    def __init__(self,
+                 single: Optional[Handler],
+                 conditional: Tuple[Handler, ...],
+                 fallback: Optional[Handler],
+                 handlers: Tuple[Handler, ...],
+                 matcher: Optional[TextMatcher] = None,
+                 base: Optional["Route"] = None,
+                 insert_at: Tuple[int, ...] = ()):
+        self.single = single
+        self.conditional = conditional
+        self.fallback = fallback
+        self.handlers = handlers
+        self.matcher = matcher
+        self.base = base
+        self.insert_at = insert_at
+
+
+def _compile_route(key_handlers: List[Handler],
+                   direct_single: bool,
+                   text_of: Optional[callable],
+                   base: Optional[Route] = None,
+                   positions: Optional[Dict[int, int]] = None) -> Route:
+    insert_at = ()
+    if base is not None:
+        # the handlers of `base` are not copied, only where the handlers of the workspace go among them
+        base_positions = [positions[id(v)] for v in base.handlers]
+        insert_at = tuple([bisect_left(base_positions, positions[id(v)]) for v in key_handlers])
+    single = key_handlers[0] if direct_single and len(key_handlers) == 1 and base is None else None
+    # the handler of the most specific scope wins, when a workspace has its own one.
+    # sorted is stable, the registration order is kept within a scope
+    conditional = tuple(sorted([v for v in key_handlers if v.has_filters], key=lambda v: -v.scope_rank))
+    fallback = max([v for v in key_handlers if not v.has_filters], key=lambda v: v.scope_rank, default=None)
+    text_patterns = [p for v in key_handlers for p in v.text_patterns]
+    keyword_sets = [v.keywords for v in key_handlers if v.keywords]
+    matcher = None
+    if (text_patterns or keyword_sets) and text_of is not None:
+        matcher = TextMatcher(text_patterns, keyword_sets)
+    return Route(single=single, conditional=conditional, fallback=fallback,
+                 handlers=tuple(key_handlers), matcher=matcher, base=base, insert_at=insert_at)
+
+
+class Router:
+    """
+    compiled index from the key to its `Route`, built once from the registered handlers.
+
+    A router of a workspace is built only from the handlers scoped to the workspace.
+    Its routes are layered on the routes of `base`, the router of the handlers for all workspaces,
+    and the other keys are looked up in `base`,
+    so that the handlers and text matchers shared by all workspaces are compiled once.
+    """
+    __slots__ = ("routes", "guard", "base", "_text_of")
+
+    def __init__(self,
+                 handlers: List[Handler],
+                 direct_single: bool = False,
+                 text_of: Optional[callable] = None,
+                 base: Optional["Router"] = None,
+                 positions: Optional[Dict[int, int]] = None,
+                 reused: Optional[Dict[str, Route]] = None):
+        """
+
+        Args:
+            handlers: registered handlers, in registration order.
+            direct_single: if True, the only handler of a key is called without checking its conditions.
+            text_of: function to get the text matched with text patterns from the payload.
+            base: router of the handlers for all workspaces, when `handlers` are the ones of a workspace.
+            positions: id of the handler -> its index in the registration order, required with `base`.
+            reused: routes kept from the previous router, for the keys whose handlers have not changed.
+        """
+        reused = reused or {}
+        grouped: Dict[str, List[Handler]] = {}
+        guards = []
+        for handler in handlers:
+            if handler.key not in reused:
+                grouped.setdefault(handler.key, []).append(handler)
+            if handler.guard:
+                guards.append(handler)
+
+        routes = dict(reused)
+        for key, key_handlers in grouped.items():
+            base_route = base.routes.get(key) if base is not None else None
+            routes[key] = _compile_route(key_handlers, direct_single, text_of, base=base_route, positions=positions)
+        self.routes = routes
+        self.base = base
+        self._text_of = text_of
+        guard = max(guards, key=lambda v: v.scope_rank, default=None)
+        self.guard = guard if guard is not None or base is None else base.guard
+
+    def _route_of(self, key: str) -> Optional[Route]:
+        route = self.routes.get(key)
+        if route is None and self.base is not None:
+            return self.base.routes.get(key)
+        return route
+
+    def resolve(self, key: str, params: dict, record: Optional[TraceRecord] = None) -> Handler:
+        """
+        find the handler to call for the payload.
+
+        Args:
+            key: event_type or command of the payload.
+            params: payload from slack.
+            record: if set, the routing decision and condition outcomes are recorded.
+
+        Raises:
+            DecoratorExecuteError: if no handler is found,
+                or multiple conditional handlers in the most specific scope pass without fallback.
+        """
+        route = self._route_of(key)
+        if route is None:
+            if self.guard is None:
+                raise DecoratorExecuteError(f"no function registered for [{key}] and no [guard] is set")
+            if record is not None:
+                record.resolved("guard", self.guard.name)
+            return self.guard
+        if route.single is not None:
+            if record is not None:
+                record.resolved("single", route.single.name)
+            return route.single
+
+        matched_texts = self._scan(route, params)
+        base = route.base
+        conditional = route.conditional if base is None else chain(route.conditional, base.conditional)
+        target = None
+        for handler in conditional:
+            # a match in a more specific scope overrides the ones in less specific scopes
+            if target is not None and handler.scope_rank < target.scope_rank:
+                break
+            passed = handler.match(params, matched_texts)
+            if record is not None:
+                record.conditions.append((handler.name, passed))
+            if passed:
+                if target is not None:
+                    target = None
+                    break
+                target = handler
+        if target is not None:
+            if record is not None:
+                record.resolved("conditional", target.name)
+            return target
+        fallback = route.fallback
+        if fallback is None and base is not None:
+            fallback = base.fallback
+        if fallback is not None:
+            if record is not None:
+                record.resolved("fallback", fallback.name)
+            return fallback
+        raise DecoratorExecuteError(f"no single function matched for [{key}]")
+
+    def resolve_all(self, key: str, params: dict) -> List[Handler]:
+        """
+        find all handlers whose conditions pass for the payload, handlers without conditions always pass.
+        [guard] is returned if no handler is registered to the key.
+
+        Raises:
+            DecoratorExecuteError: if no handler is registered to the key and no [guard] is set.
+        """
+        route = self._route_of(key)
+        if route is None:
+            if self.guard is None:
+                raise DecoratorExecuteError(f"no function registered for [{key}] and no [guard] is set")
+            return [self.guard]
+        matched_texts = self._scan(route, params)
+        if route.base is None:
+            return [v for v in route.handlers if v.match(params, matched_texts)]
+        # merge the handlers of the workspace into the ones of `base`, in registration order
+        base_handlers = route.base.handlers
+        matched = []
+        start = 0
+        for handler, index in zip(route.handlers, route.insert_at):
+            matched.extend([v for v in base_handlers[start:index] if v.match(params, matched_texts)])
+            start = index
+            if handler.match(params, matched_texts):
+                matched.append(handler)
+        matched.extend([v for v in base_handlers[start:] if v.match(params, matched_texts)])
+        return matched
+
+    def _scan(self, route: Route, params: dict) -> FrozenSet[TextKey]:
+        base_matcher = route.base.matcher if route.base is not None else None
+        if route.matcher is None and base_matcher is None:
+            return frozenset()
+        text = self._text_of(params)
+        if base_matcher is None:
+            return route.matcher.scan(text)
+        if route.matcher is None:
+            return base_matcher.scan(text)
+        return route.matcher.scan(text) | base_matcher.scan(text)
+
+
+class _Snapshot:
+    """
+    immutable state of the registry, swapped as a whole when registrations change.
+
+    `handlers` is append-only and shared with the following snapshots, each sees its first `count` handlers,
+    so that adding a handler does not copy all of them.
+    Routers are compiled lazily and cached in the snapshot, they are discarded with it.
+    """
+    __slots__ = ("handlers", "count", "team_handlers", "enterprise_handlers",
+                 "router", "tenant_routers", "shared_routers", "_positions")
+
+    def __init__(self,
+                 handlers: List[Handler],
+                 count: int,
+                 team_handlers: Dict[str, Tuple[Handler, ...]],
+                 enterprise_handlers: Dict[str, Tuple[Handler, ...]]):
+        self.handlers = handlers
+        self.count = count
+        self.team_handlers = team_handlers
+        self.enterprise_handlers = enterprise_handlers
+        self.router: Optional[Router] = None
+        # (team_id, enterprise_id) -> Router, and scoped handlers -> Router
+        self.tenant_routers: Dict[Tuple[Optional[str], Optional[str]], Router] = {}
+        self.shared_routers: Dict[Tuple[int, ...], Router] = {}
+        self._positions: Optional[Dict[int, int]] = None
+
+    def registered(self) -> List[Handler]:
+        return self.handlers[:self.count]
+
+    def positions(self) -> Dict[int, int]:
+        """
+        id of the handler -> its index in the registration order.
+        """
+        positions = self._positions
+        if positions is None:
+            positions = {id(v): i for i, v in enumerate(self.registered())}
+            self._positions = positions
+        return positions
+
+
+class Registry:
+    """
+    registered handlers of a dispatcher.
+    Ambiguous registrations are rejected in `add`,
+    and `Router` is compiled lazily once after registrations change.
+
+    Handlers scoped to team_id or enterprise_id are indexed by the id.
+    A workspace without scoped handlers uses the shared `router`,
+    and workspaces with the same scoped handlers share one compiled `Router`,
+    which has routes only for the keys of the scoped handlers and uses the shared `router` for the others,
+    so that thousands of workspaces do not copy the handlers shared by all.
+
+    Registrations are copy-on-write: `add` and `remove` build a new snapshot under a lock for writers,
+    and swap it in with one assignment. Dispatching threads read the current snapshot without locking,
+    and keep using the one they started with.
+    Once dispatching has started, the routers in use are compiled before the swap,
+    so that the first dispatches after a reload do not pay for the compilation.
+    Only the routes of the keys changed by the reload are compiled again, the others are reused.
+    """
+
+    def __init__(self, direct_single: bool = False, text_of: Optional[callable] = None):
+        """
+
+        Args:
+            direct_single: if True, the only handler of a key is called without checking its conditions.
+            text_of: function to get the text matched with text patterns from the payload.
+        """
+        self._direct_single = direct_single
+        self._text_of = text_of
+        self._snapshot = _Snapshot(handlers=[], count=0, team_handlers={}, enterprise_handlers={})
+        # state only for writers, under `_write_lock`
+        self._write_lock = threading.RLock()
+        # (scope, key) of handlers without conditions, and scopes with [guard]
+        self._unconditional_keys = set()
+        self._guard_scopes: Dict[Optional[tuple], Handler] = {}
+        # snapshot being built in `batch`, published at the end of the outermost one
+        self._draft: Optional[_Snapshot] = None
+        self._batch_depth = 0
+        # length of the published list when the batch started, to truncate it on rollback
+        self._published_length = 0
+        # keys of the handlers added or removed in the batch, whose routes are compiled again
+        self._changed_keys: Set[str] = set()
+
+    @property
+    def handlers(self) -> List[Handler]:
+        return self._snapshot.registered()
+
+    @staticmethod
+    def _scopes_of(handler: Handler) -> List[Optional[tuple]]:
+        if handler.team_ids:
+            return [("team", v) for v in sorted(handler.team_ids)]
+        if handler.enterprise_ids:
+            return [("enterprise", v) for v in sorted(handler.enterprise_ids)]
+        return [None]
+
+    @contextmanager
+    def batch(self):
+        """
+        apply all `add` and `remove` in the block at once, with a single swap at the end.
+        Nothing is applied if the block raises.
+
+        Examples:
+            >>> with registry.batch():
+            ...     registry.remove(old_function)
+            ...     registry.add(new_handler)
+        """
+        with self._write_lock:
+            if self._batch_depth == 0:
+                self._draft = self._copy(self._snapshot)
+                self._published_length = len(self._snapshot.handlers)
+                self._changed_keys = set()
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._rollback()
+                raise
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                draft, self._draft = self._draft, None
+                self._publish(draft, self._changed_keys)
+
+    @staticmethod
+    def _copy(snapshot: _Snapshot) -> _Snapshot:
+        return _Snapshot(handlers=snapshot.handlers, count=snapshot.count,
+                         team_handlers=snapshot.team_handlers, enterprise_handlers=snapshot.enterprise_handlers)
+
+    def _rollback(self):
+        self._draft = None
+        self._changed_keys = set()
+        # drop handlers appended to the published list, even if the draft has moved to a new list by `remove`
+        del self._snapshot.handlers[self._published_length:]
+        self._reindex(self._snapshot.registered())
+
+    def _reindex(self, handlers: List[Handler]):
+        self._unconditional_keys = set()
+        self._guard_scopes = {}
+        for handler in handlers:
+            for scope in self._scopes_of(handler):
+                if not handler.has_filters:
+                    self._unconditional_keys.add((scope, handler.key))
+                if handler.guard:
+                    self._guard_scopes[scope] = handler
+
+    def add(self, handler: Handler):
+        """
+
+        Raises:
+            DecoratorAddError: if [guard] is already set in the same scope,
+                or another handler without conditions is already registered to the same key in the same scope.
+        """
+        with self.batch():
+            self._add_to_draft(handler)
+
+    def _add_to_draft(self, handler: Handler):
+        if handler.team_ids and handler.enterprise_ids:
+            raise DecoratorAddError(f"set either [team_id] or [enterprise_id], got both in [{handler.name}]")
+        scopes = self._scopes_of(handler)
+        for scope in scopes:
+            if handler.guard and scope in self._guard_scopes:
+                raise DecoratorAddError(
+                    f"cannot set multiple [guard]: [{self._guard_scopes[scope].name}] is already set, "
+                    f"got [{handler.name}]")
+            if not handler.has_filters and (scope, handler.key) in self._unconditional_keys:
+                raise DecoratorAddError(
+                    f"cannot set multiple functions without conditions to [{handler.key}], got [{handler.name}]")
+
+        draft = self._draft
+        draft.handlers.append(handler)
+        draft.count += 1
+        self._changed_keys.add(handler.key)
+        for scope in scopes:
+            if not handler.has_filters:
+                self._unconditional_keys.add((scope, handler.key))
+            if handler.guard:
+                self._guard_scopes[scope] = handler
+            if scope is None:
+                continue
+            # copy only the index of the scope, the published snapshot keeps the old one
+            if scope[0] == "team":
+                if draft.team_handlers is self._snapshot.team_handlers:
+                    draft.team_handlers = dict(draft.team_handlers)
+                draft.team_handlers[scope[1]] = draft.team_handlers.get(scope[1], ()) + (handler,)
+            else:
+                if draft.enterprise_handlers is self._snapshot.enterprise_handlers:
+                    draft.enterprise_handlers = dict(draft.enterprise_handlers)
+                draft.enterprise_handlers[scope[1]] = draft.enterprise_handlers.get(scope[1], ()) + (handler,)
+
+    def remove(self, function: callable) -> int:
+        """
+        remove the handlers of the registered function.
+
+        Returns:
+            the number of handlers removed.
+        """
+        with self.batch():
+            draft = self._draft
+            registered = draft.registered()
+            kept = [v for v in registered if v.function is not function]
+            if len(kept) == len(registered):
+                return 0
+            self._changed_keys.update([v.key for v in registered if v.function is function])
+            team_handlers: Dict[str, Tuple[Handler, ...]] = {}
+            enterprise_handlers: Dict[str, Tuple[Handler, ...]] = {}
+            for handler in kept:
+                for scope in self._scopes_of(handler):
+                    if scope is None:
+                        continue
+                    index = team_handlers if scope[0] == "team" else enterprise_handlers
+                    index[scope[1]] = index.get(scope[1], ()) + (handler,)
+            # a new list, the published snapshot keeps the old one
+            draft.handlers = kept
+            draft.count = len(kept)
+            draft.team_handlers = team_handlers
+            draft.enterprise_handlers = enterprise_handlers
+            self._reindex(kept)
+            return len(registered) - len(kept)
+
+    def _publish(self, snapshot: _Snapshot, changed_keys: Collection[str]):
+        current = self._snapshot
+        if snapshot.handlers is current.handlers and snapshot.count == current.count:
+            # nothing changed, keep the compiled routers
+            return
+        # compile the routers in use, not to pause the dispatching threads after the swap.
+        # Workspaces which no longer have scoped handlers are dropped, they use the shared router
+        if current.router is not None:
+            self._router_of(snapshot, current.router, changed_keys)
+        for (team_id, enterprise_id), router in current.tenant_routers.items():
+            self._tenant_router_of(snapshot, team_id, enterprise_id, router, changed_keys)
+        self._snapshot = snapshot
+
+    @staticmethod
+    def _reused_routes(previous: Optional[Router], changed_keys: Collection[str]) -> Optional[Dict[str, Route]]:
+        if previous is None:
+            return None
+        return {k: v for k, v in previous.routes.items() if k not in changed_keys}
+
+    def _router_of(self,
+                   snapshot: _Snapshot,
+                   previous: Optional[Router] = None,
+                   changed_keys: Collection[str] = ()) -> Router:
+        router = snapshot.router
+        if router is None:
+            router = Router([v for v in snapshot.registered() if v.scope_rank == 0],
+                            direct_single=self._direct_single, text_of=self._text_of,
+                            reused=self._reused_routes(previous, changed_keys))
+            snapshot.router = router
+        return router
+
+    def _tenant_router_of(self,
+                          snapshot: _Snapshot,
+                          team_id: Optional[str],
+                          enterprise_id: Optional[str],
+                          previous: Optional[Router] = None,
+                          changed_keys: Collection[str] = ()) -> Router:
+        router = snapshot.tenant_routers.get((team_id, enterprise_id))
+        if router is not None:
+            return router
+
+        scoped = snapshot.enterprise_handlers.get(enterprise_id, ()) + snapshot.team_handlers.get(team_id, ())
+        if not scoped:
+            return self._router_of(snapshot)
+        signature = tuple(id(v) for v in scoped)
+        router = snapshot.shared_routers.get(signature)
+        if router is None:
+            # enterprise_handlers and team_handlers are each in registration order
+            positions = snapshot.positions()
+            handlers = sorted(scoped, key=lambda v: positions[id(v)])
+            router = Router(handlers, direct_single=self._direct_single, text_of=self._text_of,
+                            base=self._router_of(snapshot), positions=positions,
+                            reused=self._reused_routes(previous, changed_keys))
+            snapshot.shared_routers[signature] = router
+        snapshot.tenant_routers[(team_id, enterprise_id)] = router
+        return router
+
+    @property
+    def router(self) -> Router:
+        """
+        Router of the handlers for all workspaces.
+        """
+        return self._router_of(self._snapshot)
+
+    def router_for(self, team_id: Optional[str] = None, enterprise_id: Optional[str] = None) -> Router:
+        """
+        Router of the workspace: handlers for all workspaces, and the ones scoped to the team or enterprise.
+        """
+        return self._tenant_router_of(self._snapshot, team_id, enterprise_id)
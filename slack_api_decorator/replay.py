@@ -0,0 +1,225 @@
+"""
+replay recorded payloads through `EventSubscription` or `SlashCommand` without slack,
+to measure throughput and latency.
+
+    $ python -m slack_api_decorator.replay app:event_subscription payloads.jsonl --rate 100 --concurrency 4
+
+The file has one payload per line, shaped like the examples in the docstrings of each class.
+"""
+import argparse
+import importlib
+import json
+import math
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from .error import SlackApiDecoratorException
+from .event_subscription import EventSubscription
+from .slash_command import SlashCommand
+
+INVALID_KEY = "<invalid>"
+
+
+def load_payloads(path: str) -> Iterator[dict]:
+    """
+    read payloads from a JSONL file lazily, blank lines are skipped.
+    """
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def import_dispatcher(path: str) -> Union[EventSubscription, SlashCommand]:
+    """
+    import the dispatcher from `module:attribute`.
+    """
+    if ":" not in path:
+        raise SlackApiDecoratorException(f"dispatcher path must be `module:attribute`, got [{path}]")
+    module_name, attribute = path.split(":", 1)
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def key_of(dispatcher: Union[EventSubscription, SlashCommand], params: dict) -> str:
+    """
+    event_type or command of the payload, `INVALID_KEY` if not found.
+    """
+    try:
+        if isinstance(dispatcher, SlashCommand):
+            return dispatcher._get_command_from(params=params)
+        return dispatcher._get_event_type_from(params=params)
+    except SlackApiDecoratorException:
+        return INVALID_KEY
+
+
+class LatencyStats:
+    """
+    latencies of one event_type or command, in seconds.
+    """
+    __slots__ = ("count", "errors", "latencies")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+
+    def record(self, latency: float, error: bool):
+        self.count += 1
+        self.latencies.append(latency)
+        if error:
+            self.errors += 1
+
+    def percentile(self, p: float) -> float:
+        """
+        nearest-rank percentile, `p` in [0, 100].
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+
+class ReplayReport:
+    """
+    result of `replay`.
+
+    Attributes:
+        stats: LatencyStats for each event_type or command.
+        elapsed: seconds from the first payload sent until the last one finished.
+    """
+
+    def __init__(self, stats: Dict[str, LatencyStats], elapsed: float):
+        self.stats = stats
+        self.elapsed = elapsed
+
+    @property
+    def count(self) -> int:
+        return sum([v.count for v in self.stats.values()])
+
+    @property
+    def errors(self) -> int:
+        return sum([v.errors for v in self.stats.values()])
+
+    @property
+    def throughput(self) -> float:
+        """
+        payloads per second.
+        """
+        if self.elapsed <= 0:
+            return 0.0
+        return self.count / self.elapsed
+
+    def format(self) -> str:
+        lines = [
+            f"{'key':<30} {'count':>8} {'errors':>8} {'p50[ms]':>10} {'p90[ms]':>10} {'p99[ms]':>10} {'max[ms]':>10}"
+        ]
+        for key, v in sorted(self.stats.items()):
+            lines.append(
+                f"{key:<30} {v.count:>8} {v.errors:>8} {v.percentile(50) * 1000:>10.2f} "
+                f"{v.percentile(90) * 1000:>10.2f} {v.percentile(99) * 1000:>10.2f} "
+                f"{v.percentile(100) * 1000:>10.2f}")
+        lines.append(f"total: {self.count} payloads, {self.errors} errors, "
+                     f"{self.elapsed:.3f} s, {self.throughput:.1f} payloads/s")
+        return "\n".join(lines)
+
+
+# dispatcher imported once in each worker process
+_process_dispatcher = None
+
+
+def _init_process(dispatcher_path: str):
+    global _process_dispatcher
+    _process_dispatcher = import_dispatcher(dispatcher_path)
+
+
+def _execute_in_process(params: dict):
+    _process_dispatcher.execute(params)
+
+
+def replay(dispatcher: Union[EventSubscription, SlashCommand, str],
+           payloads: Iterable[dict],
+           rate: Optional[float] = None,
+           concurrency: int = 1,
+           use_processes: bool = False,
+           clock: callable = time.perf_counter) -> ReplayReport:
+    """
+    send payloads to `execute` of the dispatcher, and measure the latencies.
+
+    Args:
+        dispatcher: EventSubscription or SlashCommand, or `module:attribute` path to import it.
+        payloads: payloads to send, see `load_payloads`.
+        rate: payloads per second. None sends as fast as possible.
+            With `rate`, latency is measured from the scheduled time, so that queueing delay is included.
+        concurrency: the number of threads or processes.
+        use_processes: if True, payloads are executed in processes. `dispatcher` must be a path.
+        clock: clock in seconds.
+
+    Returns:
+        ReplayReport
+    """
+    if use_processes:
+        if not isinstance(dispatcher, str):
+            raise SlackApiDecoratorException("[dispatcher] must be `module:attribute` path to use processes")
+        dispatcher_path = dispatcher
+        dispatcher = import_dispatcher(dispatcher_path)
+        pool: Executor = ProcessPoolExecutor(max_workers=concurrency, initializer=_init_process,
+                                             initargs=(dispatcher_path,))
+        submit = lambda params: pool.submit(_execute_in_process, params)  # noqa: E731
+    else:
+        if isinstance(dispatcher, str):
+            dispatcher = import_dispatcher(dispatcher)
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay")
+        submit = lambda params: pool.submit(dispatcher.execute, params)  # noqa: E731
+
+    stats: Dict[str, LatencyStats] = {}
+    lock = threading.Lock()
+    # bounds payloads in flight, so that the file is not loaded at once
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+    last_finished = [0.0]
+
+    def on_done(key: str, sent_at: float) -> callable:
+        def callback(future: Future):
+            finished = clock()
+            error = future.cancelled() or future.exception() is not None
+            with lock:
+                stats.setdefault(key, LatencyStats()).record(finished - sent_at, error)
+                last_finished[0] = max(last_finished[0], finished)
+            in_flight.release()
+        return callback
+
+    started = clock()
+    try:
+        for i, params in enumerate(payloads):
+            sent_at = clock()
+            if rate is not None:
+                scheduled = started + i / rate
+                if scheduled > sent_at:
+                    time.sleep(scheduled - sent_at)
+                sent_at = scheduled
+            in_flight.acquire()
+            submit(params).add_done_callback(on_done(key_of(dispatcher, params), sent_at))
+    finally:
+        pool.shutdown(wait=True)
+    return ReplayReport(stats=stats, elapsed=max(0.0, last_finished[0] - started))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="replay recorded slack payloads")
+    parser.add_argument("dispatcher", help="`module:attribute` of EventSubscription or SlashCommand")
+    parser.add_argument("payloads", help="JSONL file of payloads")
+    parser.add_argument("--rate", type=float, default=None, help="payloads per second, default: as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=1, help="the number of threads or processes")
+    parser.add_argument("--processes", action="store_true", help="execute in processes instead of threads")
+    args = parser.parse_args(argv)
+
+    report = replay(args.dispatcher, load_payloads(args.payloads), rate=args.rate,
+                    concurrency=args.concurrency, use_processes=args.processes)
+    print(report.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .error import (
+    CircuitOpenError, DecoratorExecuteError, PartitionFullError, SlackApiDecoratorException,
+    SlackParameterNotFoundError
+)
+from .event_subscription import EventSubscription
+from .slash_command import SlashCommand
+
+logger = logging.getLogger(__name__)
+
+JSON = "application/json; charset=utf-8"
+TEXT = "text/plain; charset=utf-8"
+
+
+class HttpResponse:
+    """
+    response of `SlackHttpApp.handle`, independent of the server interface.
+    """
+    __slots__ = ("status", "content_type", "body")
+
+    def __init__(self, status: int, content_type: str = TEXT, body: bytes = b""):
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+
+    @classmethod
+    def of(cls, result: Any) -> "HttpResponse":
+        """
+        response of the registered function: dict or list as JSON, str as text, None as an empty body.
+        """
+        if result is None:
+            return cls(200)
+        if isinstance(result, (bytes, str)):
+            return cls(200, TEXT, result.encode("utf-8") if isinstance(result, str) else result)
+        return cls(200, JSON, json.dumps(result, ensure_ascii=False).encode("utf-8"))
+
+    @classmethod
+    def error(cls, status: int, message: str) -> "HttpResponse":
+        return cls(status, TEXT, message.encode("utf-8"))
+
+    @property
+    def headers(self) -> List[Tuple[str, str]]:
+        return [("Content-Type", self.content_type), ("Content-Length", str(len(self.body)))]
+
+    def __repr__(self):
+        return f"HttpResponse(status={self.status}, content_type={self.content_type!r}, body={self.body[:100]!r})"
+
+
+def verify_signature(signing_secret: str,
+                     body: bytes,
+                     timestamp: Optional[str],
+                     signature: Optional[str],
+                     now: float,
+                     tolerance: float = 300) -> bool:
+    """
+    verify `X-Slack-Signature` of the request, signed with the signing secret of the app.
+    Requests whose `X-Slack-Request-Timestamp` is older than `tolerance` seconds are rejected, against replay attacks.
+    """
+    if not timestamp or not signature:
+        return False
+    try:
+        if abs(now - int(timestamp)) > tolerance:
+            return False
+    except ValueError:
+        return False
+    expected = hmac.new(signing_secret.encode("utf-8"), b"v0:" + timestamp.encode("utf-8") + b":" + body,
+                        hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"v0={expected}", signature)
+
+
+class SlackHttpApp:
+    """
+    HTTP endpoints of `EventSubscription` and `SlashCommand`, served by an ASGI or WSGI server.
+    The body is read once, verified with the signing secret, parsed and dispatched,
+    and the response of the function is returned as JSON or text.
+
+    Events are acked after `execute`, or after `enqueue` if the EventSubscription has a `queue`.
+    With ASGI, dispatching runs in threads, so that slow functions do not block the event loop.
+
+    Examples:
+        >>> app = SlackHttpApp(event_subscription=es, slash_command=sc, signing_secret=os.environ["SLACK_SIGNING_SECRET"])
+        >>> application = app.asgi  # uvicorn module:application --workers 4
+        >>> application = app.wsgi  # gunicorn module:application --workers 4 --threads 8
+    """
+
+    def __init__(self,
+                 event_subscription: Optional[EventSubscription] = None,
+                 slash_command: Optional[SlashCommand] = None,
+                 signing_secret: Optional[str] = None,
+                 event_path: str = "/slack/events",
+                 command_path: str = "/slack/commands",
+                 ignore_retries: bool = False,
+                 max_body_size: int = 1024 * 1024,
+                 max_workers: Optional[int] = None,
+                 timestamp_tolerance: float = 300,
+                 clock: callable = time.time):
+        """
+
+        Args:
+            event_subscription: dispatcher of `event_path`.
+            slash_command: dispatcher of `command_path`.
+            signing_secret: signing secret of the slack app. Requests are not verified if None, only for local runs.
+            event_path: path of the Request URL of Event Subscriptions.
+            command_path: path of the Request URL of Slash Commands.
+            ignore_retries: if True, events retried by slack (with `X-Slack-Retry-Num`) are acked without dispatching.
+            max_body_size: bytes, larger requests are rejected with 413.
+            max_workers: the number of threads to dispatch requests of `asgi`.
+            timestamp_tolerance: seconds, requests with older timestamps are rejected.
+            clock: wall clock in seconds, compared with the timestamp of the request.
+        """
+        if event_subscription is None and slash_command is None:
+            raise SlackApiDecoratorException("set [event_subscription] or [slash_command]")
+        self.event_subscription = event_subscription
+        self.slash_command = slash_command
+        self.signing_secret = signing_secret
+        self.event_path = event_path
+        self.command_path = command_path
+        self.ignore_retries = ignore_retries
+        self.max_body_size = max_body_size
+        self.timestamp_tolerance = timestamp_tolerance
+        self._clock = clock
+        self._max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def handle(self,
+               method: str,
+               path: str,
+               headers: Mapping[str, str],
+               body: bytes,
+               received_at: Optional[float] = None) -> HttpResponse:
+        """
+        handle one request.
+
+        Args:
+            method: HTTP method.
+            path: path of the request, without the query string.
+            headers: headers with lowercase names.
+            body: the whole body.
+            received_at: time of the request receipt in the clock of SlashCommand, for `deadline`.
+        """
+        if path == self.event_path and self.event_subscription is not None:
+            dispatch = self._dispatch_event
+        elif path == self.command_path and self.slash_command is not None:
+            dispatch = self._dispatch_command
+        else:
+            return HttpResponse.error(404, "not found")
+        if method != "POST":
+            return HttpResponse.error(405, "method not allowed")
+        if len(body) > self.max_body_size:
+            return HttpResponse.error(413, "request body is too large")
+        if self.signing_secret is not None and not verify_signature(
+                self.signing_secret, body, headers.get("x-slack-request-timestamp"),
+                headers.get("x-slack-signature"), now=self._clock(), tolerance=self.timestamp_tolerance):
+            return HttpResponse.error(401, "invalid signature")
+
+        try:
+            return dispatch(headers, body, received_at)
+        except SlackParameterNotFoundError as e:
+            # not to echo the payload
+            return HttpResponse.error(400, f"[{e.missing_key}] not found in the payload")
+        except (CircuitOpenError, PartitionFullError) as e:
+            return HttpResponse.error(503, str(e))
+        except DecoratorExecuteError as e:
+            return HttpResponse.error(404, str(e))
+        except Exception:
+            logger.exception(f"failed to handle the request to [{path}]")
+            return HttpResponse.error(500, "internal server error")
+
+    def _dispatch_event(self, headers: Mapping[str, str], body: bytes, received_at: Optional[float]) -> HttpResponse:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return HttpResponse.error(400, "body must be JSON")
+        if not isinstance(payload, dict):
+            return HttpResponse.error(400, "body must be JSON object")
+        if payload.get("type") == "url_verification":
+            return HttpResponse.of({"challenge": payload.get("challenge")})
+        if self.ignore_retries and headers.get("x-slack-retry-num"):
+            return HttpResponse(200)
+        if self.event_subscription.queue is not None:
+            self.event_subscription.enqueue(payload)
+            return HttpResponse(200)
+        try:
+            self.event_subscription.execute(payload)
+        except (CircuitOpenError, PartitionFullError):
+            raise
+        except DecoratorExecuteError as e:
+            # acked, since slack retries non-2xx responses and disables the subscription which keeps failing
+            logger.warning(f"event not handled: {e}")
+        return HttpResponse(200)
+
+    def _dispatch_command(self, headers: Mapping[str, str], body: bytes, received_at: Optional[float]) -> HttpResponse:
+        try:
+            payload = urllib.parse.parse_qs(body.decode("utf-8"), keep_blank_values=True)
+        except UnicodeDecodeError:
+            return HttpResponse.error(400, "body must be UTF-8")
+        return HttpResponse.of(self.slash_command.execute(payload, received_at=received_at))
+
+    def wsgi(self, environ: Dict[str, Any], start_response: callable) -> List[bytes]:
+        """
+        WSGI application.
+        """
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            response = HttpResponse.error(400, "invalid Content-Length")
+        elif length > self.max_body_size:
+            response = HttpResponse.error(413, "request body is too large")
+        else:
+            headers = {k[5:].replace("_", "-").lower(): v for k, v in environ.items() if k.startswith("HTTP_")}
+            headers["content-type"] = environ.get("CONTENT_TYPE", "")
+            received_at = self.slash_command.now() if self.slash_command is not None else None
+            body = environ["wsgi.input"].read(length) if length else b""
+            response = self.handle(environ.get("REQUEST_METHOD", "GET"), environ.get("PATH_INFO", ""), headers, body,
+                                   received_at=received_at)
+        start_response(f"{response.status} {HTTPStatus(response.status).phrase}", response.headers)
+        return [response.body]
+
+    async def asgi(self, scope: Dict[str, Any], receive: callable, send: callable):
+        """
+        ASGI application. The dispatchers are closed at the lifespan shutdown.
+        """
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    # waits for the threads, not to block the event loop
+                    await asyncio.get_running_loop().run_in_executor(None, self.close)
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            raise SlackApiDecoratorException(f"unsupported ASGI scope [{scope['type']}]")
+
+        received_at = self.slash_command.now() if self.slash_command is not None else None
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size <= self.max_body_size:
+                chunks.append(chunk)
+            more_body = message.get("more_body", False)
+        if size > self.max_body_size:
+            response = HttpResponse.error(413, "request body is too large")
+        else:
+            headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="slack-http-app")
+            response = await asyncio.get_running_loop().run_in_executor(
+                self._pool, self.handle, scope["method"], scope["path"], headers, b"".join(chunks), received_at)
+
+        await send({
+            "type": "http.response.start",
+            "status": response.status,
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers],
+        })
+        await send({"type": "http.response.body", "body": response.body})
+
+    def close(self):
+        """
+        shutdown threads of `asgi` and of the dispatchers.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self.event_subscription is not None:
+            self.event_subscription.close()
+        if self.slash_command is not None:
+            self.slash_command.close()
@@ -1,7 +1,18 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from inspect import signature
-from typing import Optional, Union, List
+from typing import Any, Dict, Optional, Union, List
 
-from .error import SlackParameterNotFoundError, DecoratorAddError, DecoratorExecuteError
+from .cache import ResponseCache
+from .circuit import CircuitBreaker
+from .deadline import call_with_deadline
+from .error import SlackParameterNotFoundError, DecoratorAddError
+from .handler import Handler, to_id_set
+from .middleware import to_middleware_tuple
+from .registry import Registry
+from .profiling import ActiveDispatch, SlowDispatchProfiler
+from .tracing import TraceRecord, Tracer
 
 
 class SlashCommand:
@@ -30,14 +41,37 @@ class SlashCommand:
         >>> sc.execute(params=payload_from_slack)
     """
 
-    def __init__(self, app_name: str):
+    def __init__(self,
+                 app_name: str,
+                 clock: callable = time.monotonic,
+                 max_workers: Optional[int] = None,
+                 tracer: Optional[Tracer] = None,
+                 profiler: Optional[SlowDispatchProfiler] = None,
+                 middleware: Optional[Union[callable, List[callable]]] = None):
         """
         
         Args:
             app_name: application name for the instance. Currently, any name is accepted.
+            clock: monotonic clock in seconds, to measure the elapsed time for `deadline`.
+            max_workers: the number of threads to call functions with `deadline`.
+            tracer: emits the routing decision of sampled dispatches.
+            profiler: captures stack samples of dispatches slower than its threshold.
+            middleware: applied to all functions, outside the ones given to `add`. See `compose`.
         """
         self.app_name = app_name
-        self.executor_list: list = []
+        # the only function registered to a command is called without checking its conditions
+        self._registry = Registry(direct_single=True)
+        self._clock = clock
+        self._max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._tracer = tracer
+        self._profiler = profiler
+        self._middleware = to_middleware_tuple("middleware", middleware)
+
+    @property
+    def executor_list(self) -> List[Handler]:
+        return self._registry.handlers
 
     @staticmethod
     def _get_command_from(params: dict) -> str:
@@ -56,6 +90,16 @@ class SlashCommand:
         else:
             raise SlackParameterNotFoundError("command", params)
 
+    @staticmethod
+    def _get_optional_value_from(params: dict, key: str) -> Optional[str]:
+        """
+        get the value which is str or list of str in the payload, None if not found
+        """
+        value = params.get(key)
+        if type(value) == list:
+            return value[0] if value else None
+        return value
+
     @staticmethod
     def _generate_matched_function(key: str, input_x: Union[str, List[str]]) -> callable:
         if type(input_x) is str:
@@ -65,8 +109,8 @@ class SlashCommand:
         else:
             raise DecoratorAddError()
 
-    def _add_to_instance(self, executor_info: dict):
-        self.executor_list.append(executor_info)
+    def _add_to_instance(self, handler: Handler):
+        self._registry.add(handler)
 
     def add(self,
             command: str,
@@ -75,7 +119,15 @@ class SlashCommand:
             channel_id: Optional[Union[str, List[str]]] = None,
             condition: callable = None,
             after: callable = None,
-            guard=False):
+            guard=False,
+            team_id: Optional[Union[str, List[str]]] = None,
+            enterprise_id: Optional[Union[str, List[str]]] = None,
+            deadline: Optional[float] = None,
+            on_timeout: callable = None,
+            cache: Optional[ResponseCache] = None,
+            circuit: Optional[CircuitBreaker] = None,
+            on_open: callable = None,
+            middleware: Optional[Union[callable, List[callable]]] = None):
         """
         register function to be called, when the specified `command` is recieved from the slack payload.
         The name of the arguments of registered function must be `params`
@@ -87,8 +139,24 @@ class SlashCommand:
             channel_id: filter with channel_id.
             condition: additional condition whether the registered function is called.
             after: additional function with recieving the response of the function.
-            guard: if True, the registered function is always called.
-            
+            guard: if True, the registered function is called when no function is registered to the command.
+            team_id: register only for the workspaces, such as `Txxxxxxxx`. Registered for all workspaces if None.
+            enterprise_id: register only for the workspaces in the Enterprise Grid organizations.
+            deadline: seconds from the request receipt, within which the response must be returned.
+                The remaining seconds are passed as `remaining`, if the function has the argument.
+                If exceeded, the function keeps running in a thread and its result is passed to `after`.
+            on_timeout: function with `params` argument, which returns the ack response when `deadline` is exceeded.
+            cache: cache of the response for the same command and text. `after` is still called every time.
+            circuit: circuit breaker of the function and `after`, to fail fast while the dependency is failing.
+            on_open: function with `params` argument, called instead while the circuit is open,
+                such as the [guard] function. CircuitOpenError is raised if not set.
+            middleware: function receiving the next callable and returning the wrapped one, or list of them,
+                composed once around the function (with its cache, circuit and `after`). The first is the outermost.
+
+        Raises:
+            DecoratorAddError: if [guard] is already set in the same workspace scope,
+                or another function without filters is already registered to the same scope and `command`.
+
         Example:
             >>> slack_payload = {...}
             >>> slash_command = SlashCommand(app_name="your_app_name")
@@ -110,6 +178,17 @@ class SlashCommand:
                 raise DecoratorAddError("argument [condition] must be callable")
             if not (callable(after) or after is None):
                 raise DecoratorAddError("argument [after] must be callable")
+            if not (callable(on_timeout) or on_timeout is None):
+                raise DecoratorAddError("argument [on_timeout] must be callable")
+            if deadline is not None and deadline <= 0:
+                raise DecoratorAddError("argument [deadline] must be positive")
+            if not (isinstance(cache, ResponseCache) or cache is None):
+                raise DecoratorAddError("argument [cache] must be ResponseCache")
+            if not (isinstance(circuit, CircuitBreaker) or circuit is None):
+                raise DecoratorAddError("argument [circuit] must be CircuitBreaker")
+            if on_open is not None and (not callable(on_open) or circuit is None):
+                raise DecoratorAddError("argument [on_open] must be callable, and set with [circuit]")
+            handler_middleware = self._middleware + to_middleware_tuple("middleware", middleware)
 
             condition_list = []
             if condition is not None:
@@ -118,49 +197,142 @@ class SlashCommand:
                 condition_list.append(self._generate_matched_function("user_id", user_id))
             if channel_id is not None:
                 condition_list.append(self._generate_matched_function("channel_id", channel_id))
-            executor_info = {
-                "app_name": self.app_name,
-                "command": command,
-                "conditions": condition_list,
-                "after": after,
-                "function": f,
-                "guard": guard
-            }
-            self._add_to_instance(executor_info)
+            handler = Handler(
+                app_name=self.app_name,
+                key=command,
+                conditions=tuple(condition_list),
+                after=after,
+                function=f,
+                guard=guard,
+                team_ids=to_id_set("team_id", team_id),
+                enterprise_ids=to_id_set("enterprise_id", enterprise_id),
+                deadline=deadline,
+                on_timeout=on_timeout,
+                cache=cache,
+                circuit=circuit,
+                on_open=on_open,
+                middleware=handler_middleware
+            )
+            self._add_to_instance(handler)
             return f
 
         return decorator
 
-    def execute(self, params: dict):
+    def remove(self, function: callable) -> int:
+        """
+        unregister the function, without pausing `execute` running in other threads.
+
+        Returns:
+            the number of registrations removed.
+        """
+        return self._registry.remove(function)
+
+    def batch(self):
+        """
+        context manager to apply all `add` and `remove` in the block at once.
+        `execute` running in other threads sees either all of them or none of them.
+
+        Examples:
+            >>> with dispatcher.batch():
+            ...     dispatcher.remove(old_function)
+            ...     dispatcher.add(...)(new_function)
+        """
+        return self._registry.batch()
+
+    def now(self) -> float:
+        """
+        current time in the `clock` of the instance, to pass as `received_at` of `execute`.
+        """
+        return self._clock()
+
+    def execute(self, params: dict, received_at: Optional[float] = None):
+        """
+
+        Args:
+            params: payload from Slash Command of slack.
+            received_at: time of the request receipt, in the `clock` of the instance.
+                Defaults to the time `execute` is called.
+
+        Returns:
+            the response of the registered function, or of `after` if set.
+
+        Raises:
+            DecoratorExecuteError: if no function is found for the payload.
+        """
+        if received_at is None:
+            received_at = self._clock()
+        if self._profiler is None:
+            return self._execute(params, received_at, None)
+        active = self._profiler.begin(self.app_name, params, self._summarize)
+        try:
+            return self._execute(params, received_at, active)
+        finally:
+            self._profiler.end(active)
+
+    def _execute(self, params: dict, received_at: float, active: Optional[ActiveDispatch]):
+        if self._tracer is not None:
+            record = self._tracer.start(self.app_name, "slash_command")
+            if record is not None:
+                return self._tracer.run(record, self._dispatch, params, received_at=received_at, active=active)
+        return self._dispatch(params, None, received_at=received_at, active=active)
+
+    def _dispatch(self,
+                  params: dict,
+                  record: Optional[TraceRecord],
+                  received_at: float,
+                  active: Optional[ActiveDispatch]):
         command = self._get_command_from(params=params)
-        functions = [v for v in self.executor_list if v['command'] == command]
-
-        if functions:
-            if len(functions) == 1:
-                # 最初から1つの場合はそれを実行
-                target = functions[0]
-            else:
-                functions_with_condition = [v for v in functions if v['conditions']]
-                functions_pass_condition = [v for v in functions_with_condition
-                                            if all([f(params) for f in v['conditions']])]
-                functions_as_guard = [v for v in functions if not v['conditions']]
-                if len(functions_pass_condition) == 1:
-                    target = functions_pass_condition[0]
-                else:
-                    if len(functions_as_guard) == 1:
-                        target = functions_as_guard[0]
-                    else:
-                        raise DecoratorExecuteError("cannot set multiple [guard]")
+        team_id = self._get_optional_value_from(params, "team_id")
+        if record is not None:
+            record.key = command
+            record.team_id = team_id
+        router = self._registry.router_for(
+            team_id=team_id,
+            enterprise_id=self._get_optional_value_from(params, "enterprise_id"))
+        target = router.resolve(command, params, record)
+        if active is not None:
+            active.handler = target.name
+        if target.deadline is None:
+            return target(params)
 
-        else:
-            guard = [v for v in self.executor_list if v['guard']]
-            if len(guard) == 1:
-                target = guard[0]
-            else:
-                raise DecoratorExecuteError("cannot set multiple [guard]")
-
-        target_function = target['function']
-        after_function = target['after']
-        if after_function is not None:
-            return after_function(target_function(params=params))
-        return target_function(params=params)
+        pool = self._get_pool()
+        remaining = target.deadline - (self._clock() - received_at)
+        return call_with_deadline(target, params, remaining=remaining, pool=pool)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        pool = self._pool
+        if pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                    thread_name_prefix=f"{self.app_name}-deadline")
+                pool = self._pool
+        return pool
+
+    @classmethod
+    def _summarize(cls, params: dict) -> dict:
+        """
+        summary of the payload for slow dispatch samples, without the text itself
+        """
+        return {
+            "command": cls._get_optional_value_from(params, "command"),
+            "team_id": cls._get_optional_value_from(params, "team_id"),
+            "channel_id": cls._get_optional_value_from(params, "channel_id"),
+            "user_id": cls._get_optional_value_from(params, "user_id"),
+            "text_length": len(str(cls._get_optional_value_from(params, "text") or "")),
+        }
+
+    def circuit_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        `CircuitBreaker.snapshot` of each function registered with [circuit], by its qualified name.
+        """
+        return {v.name: v.circuit.snapshot() for v in self._registry.handlers if v.circuit is not None}
+
+    def close(self):
+        """
+        shutdown threads started for functions with `deadline`.
+        """
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
@@ -0,0 +1,174 @@
+import re
+import warnings
+from typing import Dict, FrozenSet, Iterable, List, Pattern, Union
+
+from .error import DecoratorAddError
+
+# flags which can be scoped to a part of the combined pattern, such as `(?i:...)`
+_SCOPED_FLAGS = ((re.ASCII, "a"), (re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+# re.UNICODE is the default of str patterns, and needs no scope
+_SUPPORTED_FLAGS = re.UNICODE | sum([flag for flag, _ in _SCOPED_FLAGS])
+# inline global flags at the start of the pattern, such as `(?i)`, which are already in `Pattern.flags`
+_GLOBAL_FLAGS = re.compile(r"^(?:\(\?[aiLmsux]+\))+")
+_UNSUPPORTED_SYNTAX = re.compile(r"\\[1-9]|\(\?P=|\(\?P<")
+_WORD = re.compile(r"\w")
+
+# identity of a text pattern or a set of keywords in TextMatcher
+TextKey = tuple
+
+
+def pattern_key(pattern: Pattern) -> TextKey:
+    return "pattern", pattern.pattern, pattern.flags
+
+
+def keywords_key(keywords: FrozenSet[str]) -> TextKey:
+    return "keywords", keywords
+
+
+def compile_text_pattern(text_pattern: Union[str, Pattern]) -> Pattern:
+    """
+    compile the `text_pattern` argument of `add`.
+
+    Inline global flags at the start, such as ``(?i)deploy``, are moved to the flags of the pattern,
+    so that they can be scoped to the pattern in `TextMatcher`.
+
+    Raises:
+        DecoratorAddError: if the pattern is invalid, or uses named groups, backreferences,
+            inline global flags not at the start or flags other than ASCII, IGNORECASE, MULTILINE,
+            DOTALL and VERBOSE, which cannot be combined with other patterns.
+    """
+    if isinstance(text_pattern, str):
+        try:
+            text_pattern = re.compile(text_pattern)
+        except re.error as e:
+            raise DecoratorAddError(f"argument [text_pattern] is invalid: {e}")
+    if not isinstance(text_pattern, re.Pattern) or not isinstance(text_pattern.pattern, str):
+        raise DecoratorAddError("argument [text_pattern] must be str or compiled str pattern")
+    if _UNSUPPORTED_SYNTAX.search(text_pattern.pattern):
+        raise DecoratorAddError("argument [text_pattern] cannot use named groups or backreferences")
+    if text_pattern.flags & ~_SUPPORTED_FLAGS:
+        raise DecoratorAddError("argument [text_pattern] can use only flags ASCII, IGNORECASE, MULTILINE, "
+                                "DOTALL and VERBOSE")
+    global_flags = _GLOBAL_FLAGS.match(text_pattern.pattern)
+    if global_flags:
+        text_pattern = re.compile(text_pattern.pattern[global_flags.end():], text_pattern.flags)
+    # fail here rather than in `TextMatcher`, for global flags in the middle of the pattern
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            re.compile(_scoped(text_pattern))
+        except (re.error, DeprecationWarning) as e:
+            raise DecoratorAddError(f"argument [text_pattern] cannot be scoped: {e}")
+    return text_pattern
+
+
+def compile_keywords(keywords: List[str]) -> FrozenSet[str]:
+    """
+    normalize the `keywords` argument of `add`.
+    Keywords match as whole words, ignoring case.
+
+    Raises:
+        DecoratorAddError: if keywords is not a non-empty list of str.
+    """
+    if type(keywords) is not list or not keywords or not all([type(v) is str and v for v in keywords]):
+        raise DecoratorAddError("argument [keywords] must be non-empty list of str")
+    return frozenset([v.lower() for v in keywords])
+
+
+def _scoped(pattern: Pattern) -> str:
+    flags = "".join([v for flag, v in _SCOPED_FLAGS if pattern.flags & flag])
+    if flags:
+        return f"(?{flags}:{pattern.pattern})"
+    return f"(?:{pattern.pattern})"
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    alternation of the words as a trie, such as ``deploy(?:\\ now)?|release``,
+    so that each position of the text fails at the first character not in any word.
+    Greedy optional branches match the longest word first.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        children = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not children:
+            return ""
+        alternation = children[0] if len(children) == 1 else f"(?:{'|'.join(children)})"
+        if "" in node:
+            return f"(?:{alternation})?"
+        return alternation
+
+    return build(trie)
+
+
+def _whole_word_prefixes(words: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    for each word, the words which are its prefix ending at a word boundary, including itself.
+    Only the longest word starting at a position is captured, these are matched at the same time.
+    """
+    words = set(words)
+    prefixes = {}
+    for word in words:
+        prefixes[word] = [
+            word[:i] for i in range(1, len(word) + 1)
+            if word[:i] in words and (i == len(word) or not _WORD.match(word[i]))
+        ]
+    return prefixes
+
+
+class TextMatcher:
+    """
+    text patterns and keywords of all handlers combined into one regular expression,
+    so that the text is scanned once, regardless of the number of handlers.
+
+    The combined expression is ``(?=k|p0|p1|...)(?=(?P<kw>k))?(?=(?P<t0>p0))?(?=(?P<t1>p1))?...``,
+    where ``k`` is all keywords as a trie and ``p0``, ``p1``, ... are text patterns:
+    the first lookahead skips positions where nothing matches,
+    and the optional lookaheads record everything matching at the position.
+    """
+    __slots__ = ("_regex", "_pattern_keys", "_keyword_keys", "_prefixes")
+
+    def __init__(self, patterns: Iterable[Pattern], keyword_sets: Iterable[FrozenSet[str]]):
+        unique_patterns = {}
+        for pattern in patterns:
+            unique_patterns.setdefault(pattern_key(pattern), pattern)
+        self._pattern_keys: List[TextKey] = list(unique_patterns.keys())
+
+        # keyword -> keys of the keyword sets containing it
+        self._keyword_keys: Dict[str, List[TextKey]] = {}
+        for keywords in set(keyword_sets):
+            for keyword in keywords:
+                self._keyword_keys.setdefault(keyword, []).append(keywords_key(keywords))
+        self._prefixes = _whole_word_prefixes(self._keyword_keys.keys())
+
+        alternatives = [_scoped(v) for v in unique_patterns.values()]
+        groups = "".join([f"(?=(?P<t{i}>{v}))?" for i, v in enumerate(alternatives)])
+        if self._keyword_keys:
+            keyword_pattern = f"(?i:(?<!\\w)(?:{_trie_pattern(self._keyword_keys.keys())})(?!\\w))"
+            alternatives.insert(0, keyword_pattern)
+            groups = f"(?=(?P<kw>{keyword_pattern}))?" + groups
+        self._regex = re.compile(f"(?={'|'.join(alternatives)}){groups}")
+
+    def scan(self, text: str) -> FrozenSet[TextKey]:
+        """
+        keys of the patterns and keyword sets which match somewhere in the text.
+        """
+        if not text:
+            return frozenset()
+        matched = set()
+        for m in self._regex.finditer(text):
+            for name, value in m.groupdict().items():
+                if value is None:
+                    continue
+                if name == "kw":
+                    for keyword in self._prefixes.get(value.lower(), ()):
+                        matched.update(self._keyword_keys[keyword])
+                else:
+                    matched.add(self._pattern_keys[int(name[1:])])
+        return frozenset(matched)
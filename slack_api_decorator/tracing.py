@@ -0,0 +1,149 @@
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .error import SlackApiDecoratorException
+
+logger = logging.getLogger(__name__)
+
+
+class TraceRecord:
+    """
+    structured record of one dispatch, emitted to the sink of `Tracer`.
+    Fields are plain values, formatting happens only when the sink calls `to_dict` or `str`.
+
+    Attributes:
+        app_name: app_name of the dispatcher.
+        kind: `event_subscription` or `slash_command`.
+        key: event_type or command of the payload.
+        team_id: team_id of the payload.
+        decision: how the handler was chosen: `single`, `conditional`, `fallback` or `guard`.
+        conditions: (function name, passed) of the handlers whose conditions were evaluated, in order.
+        target: qualified name of the called function.
+        outcome: `ok`, `error` or `dropped`.
+        error: the exception raised while dispatching.
+        resolve_seconds: seconds to choose the handler.
+        total_seconds: seconds of the whole dispatch.
+    """
+    __slots__ = ("app_name", "kind", "key", "team_id", "decision", "conditions", "target", "outcome", "error",
+                 "resolve_seconds", "total_seconds", "_clock", "_started")
+
+    def __init__(self, app_name: str, kind: str, clock: callable):
+        self.app_name = app_name
+        self.kind = kind
+        self.key: Optional[str] = None
+        self.team_id: Optional[str] = None
+        self.decision: Optional[str] = None
+        self.conditions: List[Tuple[str, bool]] = []
+        self.target: Optional[str] = None
+        self.outcome: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.resolve_seconds: Optional[float] = None
+        self.total_seconds: Optional[float] = None
+        self._clock = clock
+        self._started = clock()
+
+    def resolved(self, decision: str, target: str):
+        self.decision = decision
+        self.target = target
+        self.resolve_seconds = self._clock() - self._started
+
+    def finished(self):
+        self.total_seconds = self._clock() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "app_name": self.app_name,
+            "kind": self.kind,
+            "key": self.key,
+            "team_id": self.team_id,
+            "decision": self.decision,
+            "conditions": [{"function": name, "passed": passed} for name, passed in self.conditions],
+            "target": self.target,
+            "outcome": self.outcome,
+            "error": None if self.error is None else repr(self.error),
+            "resolve_seconds": self.resolve_seconds,
+            "total_seconds": self.total_seconds,
+        }
+
+    def __str__(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+
+class LoggingSink:
+    """
+    sink to emit trace records to a logger, formatted only if the level is enabled.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("slack_api_decorator.tracing")
+        self.level = level
+
+    def __call__(self, record: TraceRecord):
+        if self.logger.isEnabledFor(self.level):
+            # `%s` defers `str(record)` to the logging handler
+            self.logger.log(self.level, "%s", record)
+
+
+class Tracer:
+    """
+    head-based sampled tracing of dispatches.
+    Whether a dispatch is traced is decided once at its start,
+    so dispatches not sampled cost one random number.
+
+    Examples:
+        >>> tracer = Tracer(sink=LoggingSink(), sample_rate=0.01)
+        >>> es = EventSubscription("sample", tracer=tracer)
+    """
+
+    def __init__(self,
+                 sink: callable,
+                 sample_rate: float = 1.0,
+                 random_function: callable = random.random,
+                 clock: callable = time.perf_counter):
+        """
+
+        Args:
+            sink: function receiving each TraceRecord, such as `LoggingSink` or `list.append`.
+            sample_rate: ratio of dispatches to trace, in [0, 1].
+            random_function: function returning a float in [0, 1), for sampling.
+            clock: clock in seconds.
+        """
+        if not 0 <= sample_rate <= 1:
+            raise SlackApiDecoratorException("[sample_rate] must be in [0, 1]")
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self._random = random_function
+        self._clock = clock
+
+    def start(self, app_name: str, kind: str) -> Optional[TraceRecord]:
+        """
+        a new TraceRecord if the dispatch is sampled, else None.
+        """
+        if self.sample_rate < 1 and self._random() >= self.sample_rate:
+            return None
+        return TraceRecord(app_name=app_name, kind=kind, clock=self._clock)
+
+    def run(self, record: TraceRecord, dispatch: callable, params: dict, **kwargs):
+        """
+        call `dispatch(params, record, **kwargs)`, and emit the record with its outcome.
+        Errors raised in the sink are logged, not to change the result of the dispatch.
+        """
+        try:
+            result = dispatch(params, record, **kwargs)
+        except Exception as e:
+            record.outcome = "error"
+            record.error = e
+            raise
+        else:
+            if record.outcome is None:
+                record.outcome = "ok"
+            return result
+        finally:
+            record.finished()
+            try:
+                self.sink(record)
+            except Exception:
+                logger.exception(f"failed to emit the trace record of [{record.app_name}]")
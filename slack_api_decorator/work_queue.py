@@ -0,0 +1,248 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from .error import SlackApiDecoratorException
+
+logger = logging.getLogger(__name__)
+
+
+class QueueMessage:
+    """
+    a payload received from `WorkQueue.get_batch`.
+
+    Attributes:
+        message_id: id to `ack` the message.
+        payload: payload from slack.
+        attempts: the number of times the message has been received, including this time.
+    """
+    __slots__ = ("message_id", "payload", "attempts")
+
+    def __init__(self, message_id: int, payload: dict, attempts: int):
+        self.message_id = message_id
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"QueueMessage(message_id={self.message_id}, attempts={self.attempts})"
+
+
+class WorkQueue(ABC):
+    """
+    at-least-once queue of payloads.
+    A received message is invisible to other receivers for `visibility_timeout` seconds,
+    and is received again after that unless acked.
+    """
+
+    @abstractmethod
+    def put(self, payload: dict) -> int:
+        """
+        add the payload, and return its message_id.
+        """
+        pass
+
+    @abstractmethod
+    def get_batch(self, max_messages: int = 10, visibility_timeout: float = 30.0) -> List[QueueMessage]:
+        """
+        receive up to `max_messages` visible messages, in the order they were put.
+        """
+        pass
+
+    @abstractmethod
+    def ack(self, message_id: int):
+        """
+        delete the message, after it has been processed.
+        """
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """
+        the number of messages not acked yet, including invisible ones.
+        """
+        pass
+
+
+class InMemoryQueue(WorkQueue):
+    """
+    WorkQueue in the memory of the process, for tests and local runs.
+    """
+
+    def __init__(self, clock: callable = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next_id = 1
+        # message_id -> [payload, attempts, visible_at], in the order they were put
+        self._messages: "OrderedDict[int, list]" = OrderedDict()
+
+    def put(self, payload: dict) -> int:
+        with self._lock:
+            message_id = self._next_id
+            self._next_id += 1
+            self._messages[message_id] = [payload, 0, 0.0]
+            return message_id
+
+    def get_batch(self, max_messages: int = 10, visibility_timeout: float = 30.0) -> List[QueueMessage]:
+        now = self._clock()
+        batch = []
+        with self._lock:
+            for message_id, message in self._messages.items():
+                if len(batch) >= max_messages:
+                    break
+                if message[2] <= now:
+                    message[1] += 1
+                    message[2] = now + visibility_timeout
+                    batch.append(QueueMessage(message_id, message[0], message[1]))
+        return batch
+
+    def ack(self, message_id: int):
+        with self._lock:
+            self._messages.pop(message_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._messages)
+
+
+class SQLiteQueue(WorkQueue):
+    """
+    WorkQueue persisted in a SQLite file, so that messages survive restarts
+    and can be shared between processes on one machine.
+    Payloads are stored as JSON.
+    """
+
+    def __init__(self, path: str, clock: callable = time.time):
+        """
+
+        Args:
+            path: SQLite database file, created if not exists.
+            clock: wall clock in seconds, since visibility must hold across processes and restarts.
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "message_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "payload TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "visible_at REAL NOT NULL DEFAULT 0)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS messages_visible_at ON messages (visible_at)")
+
+    def put(self, payload: dict) -> int:
+        with self._lock:
+            cursor = self._connection.execute("INSERT INTO messages (payload) VALUES (?)", (json.dumps(payload),))
+            return cursor.lastrowid
+
+    def get_batch(self, max_messages: int = 10, visibility_timeout: float = 30.0) -> List[QueueMessage]:
+        now = self._clock()
+        with self._lock:
+            # lock the database, so that other processes do not receive the same messages
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._connection.execute(
+                    "SELECT message_id, payload, attempts FROM messages "
+                    "WHERE visible_at <= ? ORDER BY message_id LIMIT ?", (now, max_messages)).fetchall()
+                self._connection.executemany(
+                    "UPDATE messages SET attempts = attempts + 1, visible_at = ? WHERE message_id = ?",
+                    [(now + visibility_timeout, v[0]) for v in rows])
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return [QueueMessage(v[0], json.loads(v[1]), v[2] + 1) for v in rows]
+
+    def ack(self, message_id: int):
+        with self._lock:
+            self._connection.execute("DELETE FROM messages WHERE message_id = ?", (message_id,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class QueueWorker:
+    """
+    drain a WorkQueue in batches, and call `execute` of the dispatcher for each message.
+    Messages are acked only after `execute` succeeds,
+    failed ones are received again after `visibility_timeout`.
+
+    Examples:
+        >>> queue = SQLiteQueue("events.sqlite3")
+        >>> es = EventSubscription("sample", queue=queue)
+        >>> es.enqueue(payload_from_slack)  # in the request handler
+        >>> QueueWorker(es, queue, batch_size=10, concurrency=4).run()  # in the worker process
+    """
+
+    def __init__(self,
+                 dispatcher,
+                 queue: WorkQueue,
+                 batch_size: int = 10,
+                 concurrency: int = 1,
+                 visibility_timeout: float = 30.0,
+                 poll_interval: float = 1.0,
+                 max_attempts: Optional[int] = None):
+        """
+
+        Args:
+            dispatcher: EventSubscription or SlashCommand.
+            queue: queue to drain.
+            batch_size: the number of messages received at once.
+            concurrency: the number of threads to process messages of a batch.
+            visibility_timeout: seconds until a message not acked is received again.
+            poll_interval: seconds to wait when the queue is empty.
+            max_attempts: messages received more than this are dropped without processing. None retries forever.
+        """
+        if batch_size <= 0 or concurrency <= 0:
+            raise SlackApiDecoratorException("[batch_size] and [concurrency] must be positive")
+        self.dispatcher = dispatcher
+        self.queue = queue
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="queue-worker")
+
+    def _process(self, message: QueueMessage) -> bool:
+        if self.max_attempts is not None and message.attempts > self.max_attempts:
+            logger.error(f"message [{message.message_id}] dropped after {self.max_attempts} attempts")
+            self.queue.ack(message.message_id)
+            return False
+        try:
+            self.dispatcher.execute(message.payload)
+        except Exception:
+            logger.exception(f"message [{message.message_id}] failed, attempts: {message.attempts}")
+            return False
+        self.queue.ack(message.message_id)
+        return True
+
+    def run_once(self) -> int:
+        """
+        process one batch, and return the number of messages received.
+        """
+        batch = self.queue.get_batch(max_messages=self.batch_size, visibility_timeout=self.visibility_timeout)
+        list(self._pool.map(self._process, batch))
+        return len(batch)
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """
+        process batches until `stop` is set.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if self.run_once() == 0:
+                stop.wait(self.poll_interval)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,130 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from slack_api_decorator import SlashCommand
+from slack_api_decorator.cache import ResponseCache, normalize_text
+from slack_api_decorator.error import SlackApiDecoratorException
+import pytest
+
+from .test_deadline import FakeClock
+from .test_slash_command import generate_slash_command_payload_type_1, generate_slash_command_payload_type_2
+
+
+def status_payload(text: str, user_id: str = "Uxxxxxxxx", command: str = "/status") -> dict:
+    payload = generate_slash_command_payload_type_1(command=command, user_id=user_id)
+    payload["text"] = [text]
+    return payload
+
+
+def test_cache_ttl_and_stats():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=10, clock=clock)
+    sc = SlashCommand("cache")
+    calls = []
+
+    @sc.add(command="/status", cache=cache, after=lambda x: f"after_{x}")
+    def status(params):
+        calls.append(params)
+        return f"status_{len(calls)}"
+
+    assert sc.execute(status_payload("api")) == "after_status_1"
+    # whitespaces are normalized
+    assert sc.execute(status_payload(" api\xa0 ")) == "after_status_1"
+    assert sc.execute(status_payload("db")) == "after_status_2"
+    clock.advance(11)
+    assert sc.execute(status_payload("api")) == "after_status_3"
+    assert cache.stats() == {"hits": 1, "misses": 3, "coalesced": 0, "evictions": 0, "size": 2, "hit_rate": 0.25}
+
+
+def test_cache_vary_on_and_lru():
+    cache = ResponseCache(ttl=10, maxsize=2, vary_on=("user_id",))
+    sc = SlashCommand("cache")
+    calls = []
+
+    @sc.add(command="/oncall", cache=cache)
+    def oncall(params):
+        calls.append(params)
+        return len(calls)
+
+    assert sc.execute(status_payload("", user_id="A", command="/oncall")) == 1
+    assert sc.execute(status_payload("", user_id="B", command="/oncall")) == 2
+    assert sc.execute(status_payload("", user_id="A", command="/oncall")) == 1
+    # B is the least recently used
+    assert sc.execute(generate_slash_command_payload_type_2(command="/oncall", user_id="C")) == 3
+    assert sc.execute(status_payload("", user_id="B", command="/oncall")) == 4
+    assert cache.stats()["evictions"] == 2
+
+
+def test_cache_stampede_protection():
+    cache = ResponseCache(ttl=10)
+    sc = SlashCommand("cache")
+    release = threading.Event()
+    calls = []
+
+    @sc.add(command="/status", cache=cache)
+    def status(params):
+        calls.append(params)
+        release.wait(5)
+        return "status"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(sc.execute, status_payload("api")) for _ in range(4)]
+        while cache.stats()["coalesced"] < 3:
+            threading.Event().wait(0.001)
+        release.set()
+        assert [v.result(timeout=5) for v in futures] == ["status"] * 4
+    assert len(calls) == 1
+
+
+def test_cache_does_not_keep_errors():
+    cache = ResponseCache(ttl=10)
+    sc = SlashCommand("cache")
+    calls = []
+
+    @sc.add(command="/status", cache=cache)
+    def status(params):
+        calls.append(params)
+        if len(calls) == 1:
+            raise ValueError("error")
+        return "status"
+
+    with pytest.raises(ValueError):
+        sc.execute(status_payload("api"))
+    assert sc.execute(status_payload("api")) == "status"
+
+
+def test_cache_is_per_workspace():
+    cache = ResponseCache(ttl=10)
+    sc = SlashCommand("cache")
+
+    @sc.add(command="/status", cache=cache)
+    def status(params):
+        return params["team_id"][0]
+
+    def payload(team_id: str) -> dict:
+        payload = generate_slash_command_payload_type_1(command="/status", team_id=team_id)
+        payload["text"] = ["api"]
+        return payload
+
+    assert sc.execute(payload("T1")) == "T1"
+    assert sc.execute(payload("T2")) == "T2"
+    assert sc.execute(payload("T1")) == "T1"
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("text, ideal_result", [
+    (None, ""),
+    ("  a \xa0 b  ", "a b"),
+])
+def test_normalize_text(text, ideal_result):
+    assert normalize_text(text) == ideal_result
+
+
+def test_cache_argument_error():
+    with pytest.raises(SlackApiDecoratorException):
+        ResponseCache(ttl=0)
+    sc = SlashCommand("cache")
+    with pytest.raises(SlackApiDecoratorException):
+        @sc.add(command="/status", cache={"ttl": 10})
+        def status(params):
+            return "status"
@@ -0,0 +1,123 @@
+from slack_api_decorator import EventSubscription, SlashCommand
+from slack_api_decorator.circuit import CircuitBreaker
+from slack_api_decorator.error import CircuitOpenError, DecoratorAddError, SlackApiDecoratorException
+import pytest
+
+from .test_deadline import FakeClock
+from .test_event_subscription import generate_message_payload
+from .test_slash_command import generate_slash_command_payload_type_1
+
+
+def failing_subscription(circuit: CircuitBreaker, on_open=None):
+    es = EventSubscription("circuit")
+    state = {"fail": True, "calls": 0}
+
+    @es.add(event_type="message", circuit=circuit, on_open=on_open)
+    def call_api(params):
+        state["calls"] += 1
+        if state["fail"]:
+            raise ConnectionError("api is down")
+        return "ok"
+
+    return es, state
+
+
+def test_circuit_opens_and_fails_fast():
+    clock = FakeClock()
+    circuit = CircuitBreaker(failure_rate=0.5, minimum_calls=4, open_duration=30, clock=clock)
+    es, state = failing_subscription(circuit)
+    payload = generate_message_payload()
+
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            es.execute(payload)
+    assert circuit.state == "open"
+    with pytest.raises(CircuitOpenError):
+        es.execute(payload)
+    assert state["calls"] == 4
+    assert es.circuit_metrics()["failing_subscription.<locals>.call_api"] == {
+        "state": "open", "calls": 0, "failures": 0, "slow_calls": 0, "failure_rate": 0.0,
+        "rejected": 1, "opened_count": 1}
+
+
+def test_circuit_half_open_probe():
+    clock = FakeClock()
+    circuit = CircuitBreaker(minimum_calls=2, open_duration=30, half_open_calls=2, clock=clock)
+    es, state = failing_subscription(circuit, on_open=lambda params: "fallback")
+    payload = generate_message_payload()
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            es.execute(payload)
+    assert es.execute(payload) == "fallback"
+
+    # a failing probe opens the circuit again
+    clock.advance(30)
+    assert circuit.state == "half_open"
+    with pytest.raises(ConnectionError):
+        es.execute(payload)
+    assert es.execute(payload) == "fallback"
+
+    clock.advance(30)
+    state["fail"] = False
+    assert es.execute(payload) == "ok"
+    assert circuit.state == "half_open"
+    assert es.execute(payload) == "ok"
+    assert circuit.state == "closed"
+    assert circuit.snapshot()["opened_count"] == 2
+
+
+def test_circuit_rolling_window_and_slow_calls():
+    clock = FakeClock()
+    circuit = CircuitBreaker(failure_rate=0.5, minimum_calls=4, window=10, buckets=10,
+                             slow_call_duration=1.0, clock=clock)
+    sc = SlashCommand("circuit")
+
+    @sc.add(command="/report", circuit=circuit)
+    def report(params):
+        clock.advance(float(params["text"][0]))
+        return "report"
+
+    def payload(seconds: str) -> dict:
+        payload = generate_slash_command_payload_type_1(command="/report")
+        payload["text"] = [seconds]
+        return payload
+
+    sc.execute(payload("2"))
+    sc.execute(payload("0"))
+    assert circuit.snapshot()["slow_calls"] == 1
+    # the slow call drops out of the window
+    clock.advance(10)
+    sc.execute(payload("0"))
+    sc.execute(payload("0"))
+    sc.execute(payload("2"))
+    assert circuit.snapshot()["calls"] == 3
+    assert circuit.state == "closed"
+    sc.execute(payload("2"))
+    assert circuit.state == "open"
+
+
+def test_circuit_counts_after_and_ignores_other_errors():
+    circuit = CircuitBreaker(minimum_calls=1, failure_types=(ConnectionError,))
+    es = EventSubscription("circuit")
+
+    def post(result):
+        raise ValueError(result)
+
+    @es.add(event_type="message", circuit=circuit, after=post)
+    def call_api(params):
+        return "ok"
+
+    with pytest.raises(ValueError):
+        es.execute(generate_message_payload())
+    assert circuit.snapshot()["calls"] == 0
+    assert circuit.state == "closed"
+
+
+def test_circuit_add_validation():
+    es = EventSubscription("circuit")
+    with pytest.raises(DecoratorAddError):
+        es.add(event_type="message", circuit="circuit")(lambda params: None)
+    with pytest.raises(DecoratorAddError):
+        es.add(event_type="message", on_open=lambda params: None)(lambda params: None)
+    with pytest.raises(SlackApiDecoratorException):
+        CircuitBreaker(failure_rate=0)
@@ -0,0 +1,130 @@
+import threading
+
+from slack_api_decorator import SlashCommand
+from slack_api_decorator.error import SlackApiDecoratorException
+import pytest
+
+from .test_slash_command import generate_slash_command_payload_type_2
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+ACK = {"response_type": "ephemeral", "text": "processing..."}
+
+
+def ack(params):
+    return ACK
+
+
+def test_remaining_budget_is_passed():
+    clock = FakeClock(now=10.0)
+    sc = SlashCommand("deadline", clock=clock)
+
+    @sc.add(command="/budget", deadline=2.5, on_timeout=ack)
+    def budget(params, remaining):
+        return remaining
+
+    # 1 second has passed since the request was received
+    result = sc.execute(generate_slash_command_payload_type_2(command="/budget"), received_at=9.0)
+    sc.close()
+    assert result == pytest.approx(1.5)
+
+
+def test_deadline_creates_one_pool():
+    sc = SlashCommand("deadline")
+    sc.add(command="/budget", deadline=2.5)(lambda params: "ok")
+    barrier = threading.Barrier(8)
+    pools = []
+
+    def execute():
+        barrier.wait()
+        sc.execute(generate_slash_command_payload_type_2(command="/budget"))
+        pools.append(sc._pool)
+
+    threads = [threading.Thread(target=execute) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(map(id, pools))) == 1
+    sc.close()
+    assert sc._pool is None
+
+
+def test_exhausted_budget_falls_back_to_ack():
+    clock = FakeClock(now=10.0)
+    sc = SlashCommand("deadline", clock=clock)
+    done = threading.Event()
+    received = []
+
+    def after(result):
+        received.append(result)
+        done.set()
+
+    @sc.add(command="/late", deadline=2.5, on_timeout=ack, after=after)
+    def late(params, remaining):
+        return remaining
+
+    result = sc.execute(generate_slash_command_payload_type_2(command="/late"), received_at=7.0)
+    assert result == ACK
+    # the function is still called in background, and the result reaches `after`
+    assert done.wait(5)
+    sc.close()
+    assert received == [0.0]
+
+
+def test_slow_function_falls_back_to_ack():
+    clock = FakeClock()
+    sc = SlashCommand("deadline", clock=clock)
+    release = threading.Event()
+    done = threading.Event()
+    received = []
+
+    def after(result):
+        received.append(result)
+        done.set()
+
+    @sc.add(command="/slow", deadline=0.05, after=after)
+    def slow(params):
+        release.wait(5)
+        return "slow"
+
+    # ack is None without `on_timeout`
+    assert sc.execute(generate_slash_command_payload_type_2(command="/slow")) is None
+    release.set()
+    assert done.wait(5)
+    sc.close()
+    assert received == ["slow"]
+
+
+def test_function_error_is_raised_within_deadline():
+    sc = SlashCommand("deadline")
+
+    @sc.add(command="/error", deadline=2.5)
+    def error(params):
+        raise ValueError("error")
+
+    with pytest.raises(ValueError):
+        sc.execute(generate_slash_command_payload_type_2(command="/error"))
+    sc.close()
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"deadline": 0},
+    {"deadline": 1, "on_timeout": "some_string"},
+])
+def test_deadline_argument_error(kwargs):
+    sc = SlashCommand("deadline")
+    with pytest.raises(SlackApiDecoratorException):
+        @sc.add(command="/error", **kwargs)
+        def deadline_error(params):
+            return "error"
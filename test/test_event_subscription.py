@@ -246,3 +246,182 @@ def test_argument_name_invalid_error():
         def event_subscription_condition_error(invalid_argument):
             print(invalid_argument)
             return "error"
+
+
+def test_multiple_guard_error():
+    with pytest.raises(SlackApiDecoratorException):
+        @event_subscription.add("message", guard=True)
+        def event_subscription_guard_error(params):
+            print(params)
+            return "error"
+
+
+def test_team_scoped_event():
+    es = EventSubscription("team")
+
+    @es.add("reaction_added", reaction="+1")
+    def count(params):
+        return "global"
+
+    @es.add("reaction_added", reaction="+1", team_id="T1")
+    def count_t1(params):
+        return "T1"
+
+    @es.add("reaction_added")
+    def fallback(params):
+        return "fallback"
+
+    # the function of the workspace overrides the one for all workspaces
+    assert es.execute(generate_reaction_payload(reaction="+1", team_id="T1")) == "T1"
+    assert es.execute(generate_reaction_payload(reaction="+1", team_id="T2")) == "global"
+    payload = generate_reaction_payload(reaction="+1", team_id="T2")
+    payload["authorizations"] = [{"enterprise_id": "E1", "team_id": "T2"}]
+    assert es.execute(payload) == "global"
+
+
+def test_text_pattern_and_keywords():
+    es = EventSubscription("text")
+    scanned = []
+
+    def text_of(params):
+        scanned.append(params)
+        return EventSubscription._get_text_from(params)
+
+    # count how many times the text is scanned
+    es._registry._text_of = text_of
+
+    @es.add("message", keywords=["deploy", "release"])
+    def deploy(params):
+        return "deploy"
+
+    @es.add("message", text_pattern=r"INC-\d+")
+    def incident(params):
+        return "incident"
+
+    @es.add("message", text_pattern=r"INC-\d+", channel_id="Z")
+    def incident_in_z(params):
+        return "incident_in_z"
+
+    @es.add("message")
+    def other(params):
+        return "other"
+
+    def message(text: str, channel_id: str = "Cxxxxxxxx"):
+        payload = generate_message_payload(channel_id=channel_id)
+        payload["event"]["text"] = text
+        return payload
+
+    assert es.execute(message("Release v1.0")) == "deploy"
+    assert es.execute(message("see INC-42")) == "incident"
+    # both incident functions pass
+    assert es.execute(message("see INC-42", channel_id="Z")) == "other"
+    assert es.execute(message("hello")) == "other"
+    assert len(scanned) == 4
+    assert [v.result for v in es.execute_all(message("deploy INC-1"))] == ["deploy", "incident", "other"]
+
+
+def test_text_pattern_error():
+    with pytest.raises(SlackApiDecoratorException):
+        @event_subscription.add("message", text_pattern="(")
+        def text_pattern_error(params):
+            return "error"
+
+
+def test_ignore_filter():
+    es = EventSubscription("ignore")
+    called = []
+
+    @es.add("message")
+    def message(params):
+        called.append(params)
+        return "message"
+
+    @es.add("reaction_added")
+    def reaction_added(params):
+        called.append(params)
+        return "reaction_added"
+
+    es.add_ignore_user_id_list("UBOT")
+    es.add_ignore_bot_id("BBOT")
+    es.add_ignore_subtype("message_changed")
+    es.add_ignore_user_id_list("UBOT")
+    assert es.ignore_user_id_list == ["UBOT"]
+
+    bot_message = generate_message_payload()
+    bot_message["event"]["bot_id"] = "BBOT"
+    other_bot_message = generate_message_payload()
+    other_bot_message["event"]["bot_id"] = "BOTHER"
+    changed = generate_message_payload()
+    changed["event"]["subtype"] = "message_changed"
+
+    assert es.execute(generate_message_payload(user_id="UBOT")) is None
+    assert es.execute(generate_reaction_payload(user_id="UBOT")) is None
+    assert es.execute(bot_message) is None
+    assert es.execute_all(changed) == []
+    assert es.execute(other_bot_message) == "message"
+    assert es.execute(generate_message_payload()) == "message"
+    assert len(called) == 2
+    assert es.dropped_counts() == {"user_id": 2, "bot_id": 1, "subtype": 1}
+
+
+def test_ignore_bots():
+    es = EventSubscription("ignore", ignore_bots=True)
+
+    @es.add("message")
+    def message(params):
+        return "message"
+
+    bot_message = generate_message_payload()
+    bot_message["event"]["bot_id"] = "BOTHER"
+    subtype_message = generate_message_payload()
+    subtype_message["event"]["subtype"] = "bot_message"
+    assert es.execute(bot_message) is None
+    assert es.execute(subtype_message) is None
+    assert es.execute(generate_message_payload()) == "message"
+    assert es.dropped_counts() == {"bot_id": 1, "subtype": 1}
+
+
+def test_event_subscription_remove_and_batch():
+    es = EventSubscription("reload")
+
+    @es.add("reaction_added")
+    def old(params):
+        return "old"
+
+    def new(params):
+        return "new"
+
+    payload = generate_reaction_payload(reaction="+1")
+    assert es.execute(payload) == "old"
+    with es.batch():
+        assert es.remove(old) == 1
+        es.add("reaction_added")(new)
+    assert es.execute(payload) == "new"
+
+
+def test_ignore_user_id_list_mutation():
+    es = EventSubscription("ignore")
+
+    @es.add("message")
+    def message(params):
+        return "message"
+
+    es.ignore_user_id_list.append("U1")
+    assert es.execute(generate_message_payload(user_id="U1")) is None
+    es.ignore_user_id_list.remove("U1")
+    assert es.execute(generate_message_payload(user_id="U1")) == "message"
+    es.ignore_user_id_list = ["U2"]
+    es.ignore_user_id_list += ["U3"]
+    assert es.ignore_user_id_list == ["U2", "U3"]
+    assert es.execute(generate_message_payload(user_id="U2")) is None
+    assert es.execute(generate_message_payload(user_id="U3")) is None
+    del es.ignore_user_id_list[:]
+    assert es.execute(generate_message_payload(user_id="U2")) == "message"
+    for change in (lambda v: v.insert(0, "U4"), lambda v: v.__setitem__(0, "U4"),
+                   lambda v: v.extend(["U4"])):
+        es.ignore_user_id_list = ["U5"]
+        change(es.ignore_user_id_list)
+        assert es.execute(generate_message_payload(user_id="U4")) is None
+    es.ignore_user_id_list.pop()
+    es.ignore_user_id_list.clear()
+    assert es.execute(generate_message_payload(user_id="U5")) == "message"
@@ -0,0 +1,79 @@
+import io
+import json
+
+from slack_api_decorator import EventSubscription
+from slack_api_decorator.error import SlackApiDecoratorException
+from slack_api_decorator.export import ingest_export, iter_json_array, to_event_payload
+import pytest
+
+
+def write_export(root) -> None:
+    (root / "channels.json").write_text(json.dumps([{"id": "C001", "name": "general"}, {"id": "C002", "name": "dev"}]))
+    (root / "general").mkdir()
+    (root / "general" / "2020-01-01.json").write_text(json.dumps([
+        {"type": "message", "user": "U1", "text": "happy new year", "ts": "1577836800.000100"},
+        {"type": "message", "subtype": "channel_join", "user": "U2", "text": "joined", "ts": "1577836900.000200"},
+    ], indent=4))
+    (root / "general" / "2020-01-02.json").write_text(json.dumps([
+        {"type": "message", "user": "U1", "text": "deploy failed", "ts": "1577923200.000300"},
+    ]))
+    (root / "dev").mkdir()
+    (root / "dev" / "2020-01-01.json").write_text("[]")
+
+
+def test_iter_json_array():
+    values = [{"text": "a" * 50, "n": i} for i in range(20)] + [12345, "x", [1, 2]]
+    text = json.dumps(values, indent=2)
+    # chunks smaller than an element, and ending in the middle of a number
+    for chunk_size in (1, 7, 64, 100000):
+        assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == values
+    # numbers split at the boundary of the chunks
+    numbers = '[1.5, 2e3, {"a": 1}, -0.25e-2, 10, true, 3.0E+2]'
+    for chunk_size in range(1, len(numbers) + 1):
+        assert list(iter_json_array(io.StringIO(numbers), chunk_size=chunk_size)) == json.loads(numbers)
+    assert list(iter_json_array(io.StringIO(" [ ] "))) == []
+    for invalid in ("", "{}", "[1, 2", "[1 2]", "[1, {]"):
+        with pytest.raises(SlackApiDecoratorException):
+            list(iter_json_array(io.StringIO(invalid), chunk_size=2))
+
+
+def test_to_event_payload():
+    payload = to_event_payload({"user": "U1", "text": "hi", "ts": "1577836800.000100"}, "C001", team_id="T1")
+    assert payload["type"] == "event_callback"
+    assert payload["team_id"] == "T1"
+    assert payload["event"] == {"type": "message", "user": "U1", "text": "hi", "ts": "1577836800.000100",
+                                "channel": "C001"}
+    assert payload["event_id"] == "backfill:C001:1577836800.000100"
+    assert payload["event_time"] == 1577836800
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_ingest_export(tmp_path, concurrency):
+    write_export(tmp_path)
+    es = EventSubscription("export")
+    es.add_ignore_subtype("channel_join")
+    received = []
+
+    @es.add(event_type="message", keywords=["deploy"])
+    def deploy(params):
+        raise ValueError(params["event"]["text"])
+
+    @es.add(event_type="message")
+    def receive(params):
+        received.append((params["event"]["channel"], params["event"]["text"]))
+
+    reports = []
+    report = ingest_export(es, str(tmp_path), team_id="T1", batch_size=2, concurrency=concurrency,
+                           progress=lambda v: reports.append(v.messages))
+    assert (report.files, report.messages, report.errors) == (3, 3, 1)
+    assert reports == [2, 3]
+    assert received == [("C001", "happy new year")]
+
+
+def test_ingest_export_channels(tmp_path):
+    write_export(tmp_path)
+    es = EventSubscription("export")
+    es.add(event_type="message")(lambda params: params)
+    assert ingest_export(es, str(tmp_path), channels=["dev"]).messages == 0
+    with pytest.raises(SlackApiDecoratorException):
+        ingest_export(es, str(tmp_path / "missing"))
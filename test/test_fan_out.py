@@ -0,0 +1,114 @@
+import threading
+import time
+
+from slack_api_decorator import EventSubscription
+from slack_api_decorator.error import SlackApiDecoratorException
+import pytest
+
+from .test_event_subscription import generate_reaction_payload
+
+
+def test_execute_all_runs_concurrently():
+    es = EventSubscription("fan_out", max_workers=4)
+    # each handler waits until all handlers have started, which never happens if called serially
+    barrier = threading.Barrier(3, timeout=5)
+
+    @es.add("reaction_added", reaction="+1")
+    def count_reaction(params):
+        barrier.wait()
+        return "count"
+
+    @es.add("reaction_added", channel_id="Cxxxxxxxx")
+    def notify_channel(params):
+        barrier.wait()
+        return "notify"
+
+    @es.add("reaction_added")
+    def log_reaction(params):
+        barrier.wait()
+        return "log"
+
+    @es.add("reaction_added", reaction="-1")
+    def not_called(params):
+        return "not_called"
+
+    results = es.execute_all(generate_reaction_payload(reaction="+1"))
+    es.close()
+    assert [v.result for v in results] == ["count", "notify", "log"]
+    assert all([v.ok for v in results])
+
+
+def test_execute_all_timeout_and_error():
+    es = EventSubscription("fan_out")
+    release = threading.Event()
+
+    @es.add("reaction_added", reaction="+1", timeout=0.05)
+    def slow(params):
+        release.wait(5)
+        return "slow"
+
+    @es.add("reaction_added", after=lambda x: x + 1)
+    def error(params):
+        return "error"
+
+    @es.add("reaction_added", user_id="Uxxxxxxxx")
+    def fast(params):
+        return "fast"
+
+    started = time.monotonic()
+    results = es.execute_all(generate_reaction_payload(reaction="+1"))
+    assert time.monotonic() - started < 1
+    release.set()
+    es.close()
+
+    slow_result, error_result, fast_result = results
+    assert slow_result.timed_out and slow_result.result is None
+    assert isinstance(error_result.error, TypeError)
+    assert fast_result.ok and fast_result.result == "fast"
+
+
+def test_execute_all_guard():
+    es = EventSubscription("fan_out")
+
+    @es.add("message", guard=True)
+    def guard(params):
+        return "guard"
+
+    results = es.execute_all(generate_reaction_payload())
+    es.close()
+    assert [v.result for v in results] == ["guard"]
+
+
+def test_execute_all_no_guard_error():
+    es = EventSubscription("fan_out")
+    with pytest.raises(SlackApiDecoratorException):
+        es.execute_all(generate_reaction_payload())
+
+
+def test_timeout_not_positive_error():
+    es = EventSubscription("fan_out")
+    with pytest.raises(SlackApiDecoratorException):
+        @es.add("reaction_added", timeout=0)
+        def timeout_error(params):
+            return "error"
+
+
+def test_execute_all_creates_one_pool():
+    es = EventSubscription("fan_out")
+    es.add("reaction_added")(lambda params: "ok")
+    barrier = threading.Barrier(8)
+    pools = []
+
+    def execute():
+        barrier.wait()
+        es.execute_all(generate_reaction_payload())
+        pools.append(es._pool)
+
+    threads = [threading.Thread(target=execute) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(map(id, pools))) == 1
+    es.close()
+    assert es._pool is None
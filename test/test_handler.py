@@ -0,0 +1,40 @@
+from slack_api_decorator.handler import Handler
+import pytest
+
+
+def sample(params):
+    return params["value"]
+
+
+def test_handler_has_no_instance_dict():
+    handler = Handler(app_name="test", key="/cmd", conditions=[], after=None, function=sample, guard=False)
+    assert not hasattr(handler, "__dict__")
+    assert handler.conditions == ()
+    with pytest.raises(AttributeError):
+        handler.extra = 1
+
+
+@pytest.mark.parametrize("after, ideal_result", [
+    (None, 1),
+    (lambda x: x + 1, 2),
+])
+def test_handler_call(after, ideal_result):
+    handler = Handler(app_name="test", key="/cmd", conditions=(), after=after, function=sample, guard=False)
+    assert handler({"value": 1}) == ideal_result
+
+
+def test_handler_match_stops_at_first_failing_condition():
+    called = []
+
+    def never(params):
+        called.append("never")
+        return False
+
+    def unreachable(params):
+        called.append("unreachable")
+        return True
+
+    handler = Handler(app_name="test", key="/cmd", conditions=(never, unreachable), after=None,
+                      function=sample, guard=False)
+    assert not handler.match({})
+    assert called == ["never"]
@@ -0,0 +1,85 @@
+from slack_api_decorator import EventSubscription, SlashCommand
+from slack_api_decorator.error import DecoratorAddError
+from slack_api_decorator.middleware import compose
+import pytest
+
+from .test_deadline import FakeClock
+from .test_event_subscription import generate_reaction_payload
+from .test_slash_command import generate_slash_command_payload_type_1
+
+
+def tag(name: str, calls: list) -> callable:
+    def factory(call_next):
+        calls.append(f"compose {name}")
+
+        def middleware(params):
+            calls.append(f"before {name}")
+            result = call_next(params)
+            calls.append(f"after {name}")
+            return f"{name}({result})"
+        return middleware
+    return factory
+
+
+def test_compose_order():
+    calls = []
+    entry = compose([tag("a", calls), tag("b", calls)], lambda params: "core")
+    assert calls == ["compose b", "compose a"]
+    assert entry({}) == "a(b(core))"
+    assert calls[2:] == ["before a", "before b", "after b", "after a"]
+    with pytest.raises(DecoratorAddError):
+        compose([lambda call_next: None], lambda params: "core")
+
+
+def test_middleware_composed_once():
+    calls = []
+    es = EventSubscription("middleware", middleware=tag("global", calls))
+
+    @es.add("reaction_added", middleware=[tag("local", calls)], after=lambda x: f"after({x})")
+    def reaction(params):
+        return "reaction"
+
+    assert calls == ["compose local", "compose global"]
+    del calls[:]
+    for _ in range(3):
+        assert es.execute(generate_reaction_payload()) == "global(local(after(reaction)))"
+    assert not [v for v in calls if v.startswith("compose")]
+
+
+def test_middleware_maps_errors():
+    def map_errors(call_next):
+        def middleware(params):
+            try:
+                return call_next(params)
+            except KeyError as e:
+                return {"response_type": "ephemeral", "text": f"missing {e}"}
+        return middleware
+
+    sc = SlashCommand("middleware", middleware=[map_errors])
+
+    @sc.add(command="/report")
+    def report(params):
+        return params["missing"]
+
+    assert sc.execute(generate_slash_command_payload_type_1(command="/report")) == {
+        "response_type": "ephemeral", "text": "missing 'missing'"}
+
+
+def test_middleware_with_deadline():
+    clock = FakeClock()
+    calls = []
+    sc = SlashCommand("middleware", clock=clock, middleware=[tag("m", calls)])
+
+    @sc.add(command="/report", deadline=2.5)
+    def report(params, remaining):
+        return remaining
+
+    clock.advance(1)
+    assert sc.execute(generate_slash_command_payload_type_1(command="/report"), received_at=0) == "m(1.5)"
+    sc.close()
+
+
+def test_middleware_add_validation():
+    es = EventSubscription("middleware")
+    with pytest.raises(DecoratorAddError):
+        es.add("reaction_added", middleware=["not callable"])(lambda params: params)
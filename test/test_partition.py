@@ -0,0 +1,106 @@
+import threading
+
+from slack_api_decorator import EventSubscription
+from slack_api_decorator.error import PartitionFullError, SlackApiDecoratorException
+from slack_api_decorator.partition import PartitionedExecutor
+import pytest
+
+from .test_event_subscription import generate_message_payload, generate_reaction_payload
+
+
+def find_channels_in_different_partitions(executor: PartitionedExecutor):
+    first = generate_message_payload(channel_id="C0")
+    for i in range(1, 100):
+        other = generate_message_payload(channel_id=f"C{i}")
+        if executor.partition_of(other) != executor.partition_of(first):
+            return "C0", f"C{i}"
+
+
+def test_partition_keeps_order_per_channel():
+    es = EventSubscription("partition")
+    received = {}
+
+    @es.add("message")
+    def message(params):
+        event = params["event"]
+        received.setdefault(event["channel"], []).append(event["ts"])
+
+    executor = PartitionedExecutor(es, partitions=4)
+    futures = []
+    for i in range(50):
+        for channel_id in ["C1", "C2", "C3"]:
+            payload = generate_message_payload(channel_id=channel_id)
+            payload["event"]["ts"] = i
+            futures.append(executor.submit(payload))
+    executor.shutdown()
+    assert all([v.done() for v in futures])
+    assert received == {v: list(range(50)) for v in ["C1", "C2", "C3"]}
+
+
+def test_partition_runs_other_channels_in_parallel():
+    es = EventSubscription("partition")
+    release = threading.Event()
+
+    @es.add("message")
+    def message(params):
+        if params["event"]["channel"] == blocked_channel:
+            release.wait(5)
+        return params["event"]["channel"]
+
+    executor = PartitionedExecutor(es, partitions=4)
+    blocked_channel, free_channel = find_channels_in_different_partitions(executor)
+    blocked = executor.submit(generate_message_payload(channel_id=blocked_channel))
+    # not blocked by the other partition
+    assert executor.submit(generate_message_payload(channel_id=free_channel)).result(timeout=5) == free_channel
+    assert not blocked.done()
+    release.set()
+    assert blocked.result(timeout=5) == blocked_channel
+    executor.shutdown()
+
+
+def test_partition_backpressure():
+    es = EventSubscription("partition")
+    release = threading.Event()
+    started = threading.Event()
+
+    @es.add("message")
+    def message(params):
+        started.set()
+        release.wait(5)
+
+    executor = PartitionedExecutor(es, partitions=1, max_queue_size=1)
+    executor.submit(generate_message_payload())
+    started.wait(5)
+    executor.submit(generate_message_payload())
+    with pytest.raises(PartitionFullError):
+        executor.submit(generate_message_payload(), timeout=0.01)
+    release.set()
+    executor.shutdown()
+
+
+def test_partition_by_user_and_error():
+    es = EventSubscription("partition")
+
+    @es.add("reaction_added", reaction="+1")
+    def reaction_added(params):
+        return params["event"]["user"]
+
+    executor = PartitionedExecutor(es, partitions=2, key="user")
+    assert executor.submit(generate_reaction_payload(user_id="A", reaction="+1")).result(timeout=5) == "A"
+    with pytest.raises(SlackApiDecoratorException):
+        executor.submit(generate_reaction_payload(user_id="A", reaction="-1")).result(timeout=5)
+    # payload without user is executed in the first partition
+    assert executor.partition_of({"event": {"type": "reaction_added"}}) == 0
+    executor.shutdown()
+    with pytest.raises(SlackApiDecoratorException):
+        executor.submit(generate_reaction_payload())
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"partitions": 0},
+    {"max_queue_size": 0},
+    {"key": "team"},
+])
+def test_partition_argument_error(kwargs):
+    with pytest.raises(SlackApiDecoratorException):
+        PartitionedExecutor(EventSubscription("partition"), **kwargs)
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+
+from slack_api_decorator import EventSubscription
+from slack_api_decorator.error import DecoratorAddError
+from slack_api_decorator.process_pool import ProcessPool, import_path_of
+import pytest
+
+from .test_event_subscription import generate_message_payload
+
+es = EventSubscription("process_pool", max_processes=2)
+after_pids = []
+
+
+def record_after(result):
+    after_pids.append(os.getpid())
+    return result
+
+
+@es.add(event_type="message", in_process_pool=True, after=record_after)
+def count_words(params):
+    return {"pid": os.getpid(), "words": len(params["event"]["text"].split())}
+
+
+@es.add(event_type="file_shared", in_process_pool=True)
+def parse_file(params):
+    raise ValueError(params["event"]["file_id"])
+
+
+def test_import_path_of():
+    assert import_path_of(count_words) == f"{__name__}:count_words"
+    with pytest.raises(DecoratorAddError):
+        import_path_of(lambda params: params)
+
+
+def test_in_process_pool():
+    try:
+        payload = generate_message_payload()
+        payload["event"]["text"] = "parse this file"
+        result = es.execute(payload)
+        assert result["words"] == 3
+        assert result["pid"] != os.getpid()
+        # `after` runs in the parent
+        assert after_pids == [os.getpid()]
+
+        with pytest.raises(ValueError):
+            es.execute({"event": {"type": "file_shared", "file_id": "Fxxxxxxxx"}})
+    finally:
+        es.close()
+
+
+def test_in_process_pool_requires_top_level_function():
+    local = EventSubscription("process_pool")
+    with pytest.raises(DecoratorAddError):
+        @local.add(event_type="message", in_process_pool=True)
+        def nested(params):
+            return params
+
+
+def test_process_pool_restarts_after_shutdown():
+    pool = ProcessPool(max_workers=1)
+    path = import_path_of(count_words)
+    payload = generate_message_payload()
+    payload["event"]["text"] = "a b"
+    assert pool.call(path, payload)["words"] == 2
+    pool.shutdown()
+    assert pool.call(path, payload)["words"] == 2
+    pool.shutdown()
+
+
+def test_process_pool_does_not_fork_by_default():
+    assert ProcessPool().mp_context.get_start_method() in ("forkserver", "spawn")
+    spawn = multiprocessing.get_context("spawn")
+    assert EventSubscription("process_pool", mp_context=spawn)._process_pool.mp_context is spawn
@@ -0,0 +1,104 @@
+import json
+import time
+
+from slack_api_decorator import EventSubscription, SlashCommand
+from slack_api_decorator.error import SlackApiDecoratorException
+from slack_api_decorator.profiling import SlowDispatchProfiler
+import pytest
+
+from .test_event_subscription import generate_message_payload, generate_reaction_payload
+from .test_slash_command import generate_slash_command_payload_type_1
+
+
+def test_profiler_records_slow_dispatch():
+    profiler = SlowDispatchProfiler(threshold=0.02, interval=0.002)
+    es = EventSubscription("profile", profiler=profiler)
+
+    @es.add("message")
+    def slow_message(params):
+        time.sleep(0.1)
+        return "slow"
+
+    @es.add("reaction_added")
+    def fast_reaction(params):
+        return "fast"
+
+    assert es.execute(generate_reaction_payload()) == "fast"
+    assert es.execute(generate_message_payload(channel_id="Z")) == "slow"
+    profiler.close()
+
+    samples = profiler.samples()
+    assert len(samples) == 1
+    sample = samples[0]
+    assert sample.handler.endswith("slow_message")
+    assert sample.elapsed >= 0.1
+    assert sample.summary["event_type"] == "message" and sample.summary["channel"] == "Z"
+    assert sample.stacks and "slow_message" in sample.stacks[0][0]
+
+    dumped = [json.loads(v) for v in profiler.dump(clear=True).splitlines()]
+    assert dumped[0]["handler"] == sample.handler
+    assert profiler.samples() == []
+
+
+def test_profiler_ring_buffer():
+    now = [0.0]
+    profiler = SlowDispatchProfiler(threshold=1.0, capacity=2, clock=lambda: now[0])
+    sc = SlashCommand("profile", profiler=profiler)
+
+    @sc.add(command="/slow")
+    def slow_command(params):
+        now[0] += 2.0
+        return "slow"
+
+    for command in ["/slow", "/slow", "/slow"]:
+        sc.execute(generate_slash_command_payload_type_1(command=command))
+    profiler.close()
+    samples = profiler.samples()
+    assert len(samples) == 2
+    assert samples[0].summary["command"] == "/slow"
+    assert samples[0].elapsed == 2.0
+
+
+def test_profiler_records_failed_dispatch():
+    # the sampler thread may also read the clock
+    ticks = iter([0.0])
+    profiler = SlowDispatchProfiler(threshold=1.0, clock=lambda: next(ticks, 2.0))
+    es = EventSubscription("profile", profiler=profiler)
+
+    @es.add("message")
+    def message(params):
+        return "message"
+
+    with pytest.raises(SlackApiDecoratorException):
+        es.execute({"event": []})
+    profiler.close()
+    sample = profiler.samples()[0]
+    assert sample.handler is None
+    assert sample.summary["event_type"] is None
+
+
+def test_profiler_argument_error():
+    with pytest.raises(SlackApiDecoratorException):
+        SlowDispatchProfiler(threshold=0)
+
+
+def test_profiler_sampler_waits_for_threshold():
+    now = [0.0]
+    reads = []
+
+    def clock():
+        reads.append(now[0])
+        return now[0]
+
+    profiler = SlowDispatchProfiler(threshold=60.0, interval=0.001, clock=clock)
+    es = EventSubscription("profile", profiler=profiler)
+    es.add("reaction_added")(lambda params: time.sleep(0.05))
+    es.execute(generate_reaction_payload())
+    # idle sampler does not poll
+    time.sleep(0.05)
+    count = len(reads)
+    time.sleep(0.05)
+    assert len(reads) == count
+    # the sampler waited for the threshold instead of every interval
+    assert count <= 4
+    profiler.close()
@@ -0,0 +1,317 @@
+import threading
+
+from slack_api_decorator.error import DecoratorAddError, DecoratorExecuteError
+from slack_api_decorator.handler import Handler
+from slack_api_decorator.registry import Registry
+import pytest
+
+
+def generate_handler(key: str, conditions=(), guard=False, result=None) -> Handler:
+    return Handler(app_name="test", key=key, conditions=conditions, after=None,
+                   function=lambda params: result, guard=guard)
+
+
+def is_user(user: str) -> callable:
+    return lambda x: x["user"] == user
+
+
+def test_registry_multiple_guard_error():
+    registry = Registry()
+    registry.add(generate_handler("a", guard=True))
+    with pytest.raises(DecoratorAddError):
+        registry.add(generate_handler("b", guard=True))
+
+
+def test_registry_multiple_unconditional_error():
+    registry = Registry()
+    registry.add(generate_handler("a"))
+    registry.add(generate_handler("a", conditions=(is_user("A"),)))
+    with pytest.raises(DecoratorAddError):
+        registry.add(generate_handler("a"))
+    # failed registration is not added
+    assert len(registry.handlers) == 2
+
+
+def test_registry_router_is_compiled_once():
+    registry = Registry()
+    registry.add(generate_handler("a"))
+    router = registry.router
+    assert registry.router is router
+    registry.add(generate_handler("b"))
+    assert registry.router is not router
+
+
+@pytest.mark.parametrize("params, ideal_result", [
+    ({"user": "A"}, "A"),
+    ({"user": "B"}, "B"),
+    # both conditions pass -> fallback
+    ({"user": "AB"}, "fallback"),
+    ({"user": "C"}, "fallback"),
+])
+def test_router_resolve(params, ideal_result):
+    registry = Registry()
+    registry.add(generate_handler("a", conditions=(is_user("A"),), result="A"))
+    registry.add(generate_handler("a", conditions=(is_user("B"),), result="B"))
+    registry.add(generate_handler("a", conditions=(lambda x: x["user"] == "AB",), result="AB"))
+    registry.add(generate_handler("a", conditions=(lambda x: x["user"] == "AB",), result="AB"))
+    registry.add(generate_handler("a", result="fallback"))
+    assert registry.router.resolve("a", params)(params) == ideal_result
+
+
+def test_router_resolve_error():
+    registry = Registry()
+    registry.add(generate_handler("a", conditions=(is_user("A"),)))
+    with pytest.raises(DecoratorExecuteError):
+        registry.router.resolve("a", {"user": "B"})
+    with pytest.raises(DecoratorExecuteError):
+        registry.router.resolve("b", {"user": "A"})
+
+
+def test_router_direct_single():
+    registry = Registry(direct_single=True)
+    registry.add(generate_handler("a", conditions=(is_user("A"),), result="A"))
+    assert registry.router.resolve("a", {"user": "B"})({}) == "A"
+
+
+def generate_scoped_handler(key: str, team_ids=None, enterprise_ids=None, conditions=(), guard=False,
+                            result=None) -> Handler:
+    return Handler(app_name="test", key=key, conditions=conditions, after=None,
+                   function=lambda params: result, guard=guard,
+                   team_ids=frozenset(team_ids) if team_ids else None,
+                   enterprise_ids=frozenset(enterprise_ids) if enterprise_ids else None)
+
+
+def test_registry_router_for_workspace():
+    registry = Registry()
+    registry.add(generate_scoped_handler("a", result="global"))
+    registry.add(generate_scoped_handler("a", team_ids=["T1"], result="T1"))
+    registry.add(generate_scoped_handler("a", enterprise_ids=["E1"], result="E1"))
+    registry.add(generate_scoped_handler("b", team_ids=["T1", "T2"], result="T1T2"))
+    registry.add(generate_scoped_handler("c", guard=True, result="guard"))
+    registry.add(generate_scoped_handler("c", team_ids=["T2"], guard=True, result="T2 guard"))
+
+    def resolve(key, team_id=None, enterprise_id=None):
+        return registry.router_for(team_id, enterprise_id).resolve(key, {})({})
+
+    assert resolve("a") == "global"
+    assert resolve("a", team_id="T9") == "global"
+    # the most specific scope wins
+    assert resolve("a", team_id="T1") == "T1"
+    assert resolve("a", enterprise_id="E1") == "E1"
+    assert resolve("a", team_id="T1", enterprise_id="E1") == "T1"
+    assert resolve("b", team_id="T2") == "T1T2"
+    assert resolve("x", team_id="T1") == "guard"
+    assert resolve("x", team_id="T2") == "T2 guard"
+    # handlers of other workspaces are not visible
+    assert resolve("b", team_id="T3") == "guard"
+
+
+def test_registry_routers_are_shared_between_workspaces():
+    registry = Registry()
+    registry.add(generate_scoped_handler("a", result="global"))
+    registry.add(generate_scoped_handler("b", team_ids=[f"T{i}" for i in range(1000)]))
+    registry.add(generate_scoped_handler("c", team_ids=["T0"]))
+
+    # workspaces without their own handlers use the shared router
+    assert registry.router_for("T9999") is registry.router
+    assert registry.router_for("T1") is registry.router_for("T999")
+    assert registry.router_for("T0") is not registry.router_for("T1")
+    assert len(registry._snapshot.shared_routers) == 2
+
+
+
+def test_registry_tenant_router_shares_global_routes():
+    registry = Registry(text_of=lambda params: params["text"])
+    for i in range(200):
+        registry.add(Handler(app_name="test", key=f"k{i}", conditions=(), after=None,
+                             function=lambda params: "global", guard=False, keywords=frozenset([f"w{i}"])))
+    registry.add(generate_scoped_handler("k0", team_ids=["T1"], result="T1"))
+
+    router = registry.router_for("T1")
+    # the workspace compiles only its own handler, whatever the number of shared handlers
+    assert list(router.routes) == ["k0"]
+    assert router.routes["k0"].handlers == registry._snapshot.team_handlers["T1"]
+    assert router.routes["k0"].matcher is None
+    assert router.routes["k0"].base is registry.router.routes["k0"]
+    assert router.base is registry.router
+    assert router.resolve("k0", {"text": "w0"})({}) == "global"
+    assert router.resolve("k0", {"text": "other"})({}) == "T1"
+    assert router.resolve("k5", {"text": "w5"})({}) == "global"
+    assert router.resolve_all("k5", {"text": "w5"}) == list(registry.router.routes["k5"].handlers)
+
+
+def test_registry_tenant_router_resolve_all_order():
+    registry = Registry()
+    first = generate_scoped_handler("a", conditions=(is_user("A"),))
+    scoped = generate_scoped_handler("a", team_ids=["T1"], conditions=(is_user("A"),))
+    last = generate_scoped_handler("a")
+    for handler in (first, scoped, last):
+        registry.add(handler)
+    assert registry.router_for("T1").resolve_all("a", {"user": "A"}) == [first, scoped, last]
+    assert registry.router_for("T1").resolve_all("a", {"user": "B"}) == [last]
+    assert registry.router_for("T2").resolve_all("a", {"user": "A"}) == [first, last]
+
+@pytest.mark.parametrize("handlers", [
+    [generate_scoped_handler("a", team_ids=["T1"]), generate_scoped_handler("a", team_ids=["T1", "T2"])],
+    [generate_scoped_handler("a", team_ids=["T1"], guard=True), generate_scoped_handler("b", team_ids=["T1"], guard=True)],
+    [generate_scoped_handler("a", team_ids=["T1"], enterprise_ids=["E1"])],
+])
+def test_registry_scoped_error(handlers):
+    registry = Registry()
+    with pytest.raises(DecoratorAddError):
+        for handler in handlers:
+            registry.add(handler)
+
+
+def test_registry_same_key_in_other_scopes():
+    registry = Registry()
+    registry.add(generate_scoped_handler("a", guard=True))
+    registry.add(generate_scoped_handler("a", team_ids=["T1"], guard=True))
+    registry.add(generate_scoped_handler("a", enterprise_ids=["T1"], guard=True))
+    assert len(registry.handlers) == 3
+
+
+def test_registry_remove():
+    registry = Registry()
+    fallback = generate_handler("a", result="fallback")
+    registry.add(generate_handler("a", conditions=(is_user("A"),), result="A"))
+    registry.add(fallback)
+    registry.add(generate_scoped_handler("a", team_ids=["T1"], result="T1"))
+    old_router = registry.router
+
+    assert registry.remove(fallback.function) == 1
+    assert registry.remove(fallback.function) == 0
+    assert len(registry.handlers) == 2
+    with pytest.raises(DecoratorExecuteError):
+        registry.router.resolve("a", {"user": "B"})
+    # the router taken before keeps working
+    assert old_router.resolve("a", {"user": "B"})({}) == "fallback"
+    # the function without conditions can be added again
+    registry.add(generate_handler("a", result="new fallback"))
+    assert registry.router.resolve("a", {"user": "B"})({}) == "new fallback"
+    assert registry.router_for("T1").resolve("a", {"user": "B"})({}) == "T1"
+
+
+def test_registry_batch_is_atomic():
+    registry = Registry()
+    registry.add(generate_handler("a", result="old"))
+    router = registry.router
+    with registry.batch():
+        registry.remove(registry.handlers[0].function)
+        registry.add(generate_handler("a", result="new"))
+        # not published until the end of the batch
+        assert registry.router is router
+    assert registry.router.resolve("a", {})({}) == "new"
+
+    with pytest.raises(DecoratorAddError):
+        with registry.batch():
+            registry.add(generate_handler("b"))
+            registry.add(generate_handler("a"))
+    assert [v.key for v in registry.handlers] == ["a"]
+    # the state for validation is rolled back too
+    registry.add(generate_handler("b"))
+
+
+def test_registry_compiles_routers_in_use_before_swap():
+    registry = Registry()
+    registry.add(generate_scoped_handler("a", result="global"))
+    registry.add(generate_scoped_handler("a", team_ids=["T1"], result="T1"))
+    # not compiled before dispatching starts
+    assert registry._snapshot.router is None
+    registry.router_for("T1")
+    registry.add(generate_scoped_handler("b", result="b"))
+    assert ("T1", None) in registry._snapshot.tenant_routers
+    registry.router_for("T2")
+    registry.add(generate_scoped_handler("c", result="c"))
+    assert registry._snapshot.router is not None
+
+
+def test_registry_reload_reuses_unchanged_routes():
+    registry = Registry()
+    registry.add(generate_scoped_handler("a", result="global a"))
+    registry.add(generate_scoped_handler("b", result="global b"))
+    registry.add(generate_scoped_handler("a", team_ids=["T1"], result="T1"))
+    registry.add(generate_scoped_handler("b", team_ids=["T2"], result="T2"))
+    t1_a = registry.router_for("T1").routes["a"]
+    t2_b = registry.router_for("T2").routes["b"]
+    global_a = registry.router.routes["a"]
+
+    registry.add(generate_scoped_handler("c", team_ids=["T1"], result="T1 c"))
+    # routes of the keys not changed are not compiled again, in any workspace
+    assert registry.router_for("T2").routes["b"] is t2_b
+    assert registry.router_for("T1").routes["a"] is t1_a
+    assert registry.router.routes["a"] is global_a
+    assert registry.router_for("T1").resolve("c", {})({}) == "T1 c"
+    assert registry.router_for("T2").base is registry.router
+
+    # the route of the changed key is compiled again
+    registry.add(generate_scoped_handler("a", conditions=(is_user("A"),), result="global A"))
+    assert registry.router.routes["a"] is not global_a
+    assert registry.router_for("T1").routes["a"] is not t1_a
+    assert registry.router_for("T1").resolve("a", {"user": "A"})({}) == "global A"
+    assert registry.router_for("T2").routes["b"] is t2_b
+
+    # workspaces without scoped handlers are dropped
+    registry.remove(registry._snapshot.team_handlers["T2"][0].function)
+    assert ("T2", None) not in registry._snapshot.tenant_routers
+    assert registry.router_for("T2") is registry.router
+
+
+def test_registry_concurrent_reload():
+    registry = Registry()
+    registry.add(generate_handler("a", result="a"))
+    stop = threading.Event()
+    errors = []
+
+    def dispatch():
+        while not stop.is_set():
+            try:
+                assert registry.router_for("T1").resolve("a", {"user": "A"})({}) == "a"
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=dispatch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(90):
+        handler = generate_scoped_handler(f"k{i}", team_ids=["T1"] if i % 2 else None,
+                                          conditions=(is_user("A"),))
+        registry.add(handler)
+        if i % 3 == 0:
+            registry.remove(handler.function)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(registry.handlers) == 61
+
+
+def test_registry_rollback_after_add_and_remove():
+    registry = Registry()
+    a, b, c = generate_handler("a"), generate_handler("b"), generate_handler("c")
+    registry.add(a)
+    with pytest.raises(RuntimeError):
+        with registry.batch():
+            registry.add(b)
+            registry.remove(a.function)
+            raise RuntimeError()
+    registry.add(c)
+    assert registry.handlers == [a, c]
+
+
+def test_router_conditional_scope_precedence():
+    registry = Registry()
+    registry.add(generate_scoped_handler("a", conditions=(is_user("A"),), result="global"))
+    registry.add(generate_scoped_handler("a", conditions=(is_user("A"),), enterprise_ids=["E1"], result="E1"))
+    registry.add(generate_scoped_handler("a", conditions=(is_user("A"),), team_ids=["T1"], result="T1"))
+
+    def resolve(team_id=None, enterprise_id=None):
+        return registry.router_for(team_id, enterprise_id).resolve("a", {"user": "A"})({})
+
+    assert resolve() == "global"
+    assert resolve(enterprise_id="E1") == "E1"
+    assert resolve(team_id="T1", enterprise_id="E1") == "T1"
+    # ties in the same scope are still ambiguous
+    registry.add(generate_scoped_handler("a", conditions=(is_user("A"),), team_ids=["T1"], result="T1 again"))
+    with pytest.raises(DecoratorExecuteError):
+        resolve(team_id="T1")
@@ -0,0 +1,86 @@
+import json
+
+from slack_api_decorator import EventSubscription, SlashCommand
+from slack_api_decorator.error import SlackApiDecoratorException
+from slack_api_decorator.replay import INVALID_KEY, LatencyStats, load_payloads, replay
+import pytest
+
+from .test_event_subscription import generate_message_payload, generate_reaction_payload
+from .test_slash_command import generate_slash_command_payload_type_2
+
+# imported by path in worker processes
+replay_subscription = EventSubscription("replay")
+
+
+@replay_subscription.add("reaction_added")
+def replay_reaction_added(params):
+    return "reaction_added"
+
+
+@replay_subscription.add("message", user_id="A")
+def replay_message(params):
+    return "message"
+
+
+@pytest.fixture
+def payload_file(tmp_path):
+    path = tmp_path / "payloads.jsonl"
+    payloads = [generate_reaction_payload()] * 5 + [generate_message_payload(user_id="A")] * 3
+    # the message of user B is not matched, and is counted as an error
+    payloads += [generate_message_payload(user_id="B"), {"event": {}}]
+    path.write_text("\n".join([json.dumps(v) for v in payloads]) + "\n\n")
+    return str(path)
+
+
+def test_load_payloads(payload_file):
+    assert len(list(load_payloads(payload_file))) == 10
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"concurrency": 1},
+    {"concurrency": 4},
+    {"concurrency": 2, "rate": 1000},
+])
+def test_replay_event_subscription(payload_file, kwargs):
+    report = replay(replay_subscription, load_payloads(payload_file), **kwargs)
+    assert report.count == 10
+    assert report.stats["reaction_added"].count == 5
+    assert report.stats["message"].count == 4
+    assert report.stats["message"].errors == 1
+    assert report.stats[INVALID_KEY].errors == 1
+    assert report.throughput > 0
+    assert "reaction_added" in report.format()
+
+
+def test_replay_slash_command():
+    sc = SlashCommand("replay")
+
+    @sc.add(command="/status")
+    def status(params):
+        return "ok"
+
+    payloads = [generate_slash_command_payload_type_2(command="/status")] * 3
+    report = replay(sc, payloads, concurrency=2)
+    assert report.stats["/status"].count == 3
+    assert report.errors == 0
+
+
+def test_replay_processes(payload_file):
+    report = replay("test.test_replay:replay_subscription", load_payloads(payload_file),
+                    concurrency=2, use_processes=True)
+    assert report.count == 10
+    assert report.errors == 2
+
+
+def test_replay_processes_error():
+    with pytest.raises(SlackApiDecoratorException):
+        replay(replay_subscription, [], use_processes=True)
+
+
+def test_latency_stats_percentile():
+    stats = LatencyStats()
+    for i in range(1, 101):
+        stats.record(i / 1000, error=False)
+    assert stats.percentile(50) == 0.05
+    assert stats.percentile(99) == 0.099
+    assert stats.percentile(100) == 0.1
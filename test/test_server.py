@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import threading
+import urllib.parse
+from wsgiref.util import setup_testing_defaults
+
+from slack_api_decorator import EventSubscription, SlashCommand
+from slack_api_decorator.server import SlackHttpApp, verify_signature
+from slack_api_decorator.work_queue import InMemoryQueue
+
+from .test_deadline import FakeClock
+from .test_event_subscription import generate_message_payload
+
+SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+NOW = 1531420618
+
+
+def sign(body: bytes, timestamp: int = NOW) -> dict:
+    digest = hmac.new(SECRET.encode(), f"v0:{timestamp}:".encode() + body, hashlib.sha256).hexdigest()
+    return {"x-slack-request-timestamp": str(timestamp), "x-slack-signature": f"v0={digest}"}
+
+
+def build_app(**kwargs) -> SlackHttpApp:
+    es = EventSubscription("server", queue=kwargs.pop("queue", None))
+    sc = SlashCommand("server")
+    es.received = []
+
+    @es.add(event_type="message")
+    def receive_message(params):
+        es.received.append(params)
+
+    @sc.add(command="/echo")
+    def echo(params):
+        return {"response_type": "in_channel", "text": params["text"][0]}
+
+    @sc.add(command="/ping")
+    def ping(params):
+        return "pong"
+
+    return SlackHttpApp(event_subscription=es, slash_command=sc, signing_secret=SECRET, clock=lambda: NOW, **kwargs)
+
+
+def test_verify_signature():
+    body = b"token=xyz&command=%2Fecho"
+    headers = sign(body)
+    signature = headers["x-slack-signature"]
+    assert verify_signature(SECRET, body, str(NOW), signature, now=NOW)
+    assert not verify_signature(SECRET, body + b"&", str(NOW), signature, now=NOW)
+    assert not verify_signature(SECRET, body, str(NOW), signature, now=NOW + 301)
+    assert not verify_signature(SECRET, body, None, signature, now=NOW)
+
+
+def test_handle_events():
+    app = build_app()
+    body = json.dumps({"type": "url_verification", "challenge": "3eZbrw1aBm2rZgRNFdxV2595E9CY3gmdALWMmHkvFXO7tYXAYM8P"})
+    response = app.handle("POST", "/slack/events", sign(body.encode()), body.encode())
+    assert response.status == 200
+    assert response.content_type.startswith("application/json")
+    assert json.loads(response.body)["challenge"].startswith("3eZbrw")
+
+    body = json.dumps(generate_message_payload()).encode()
+    assert app.handle("POST", "/slack/events", sign(body), body).status == 200
+    assert len(app.event_subscription.received) == 1
+
+    assert app.handle("POST", "/slack/events", sign(body, NOW - 600), body).status == 401
+    assert app.handle("POST", "/slack/events", sign(b"{"), b"{").status == 400
+    assert app.handle("GET", "/slack/events", {}, b"").status == 405
+    assert app.handle("POST", "/unknown", {}, b"").status == 404
+    # acked, not to be retried by slack
+    body = json.dumps({"event": {"type": "reaction_added"}}).encode()
+    assert app.handle("POST", "/slack/events", sign(body), body).status == 200
+    body = urllib.parse.urlencode({"command": "/unknown"}).encode()
+    assert app.handle("POST", "/slack/commands", sign(body), body).status == 404
+
+
+def test_handle_events_with_queue_and_retries():
+    queue = InMemoryQueue()
+    app = build_app(queue=queue, ignore_retries=True)
+    body = json.dumps(generate_message_payload()).encode()
+    assert app.handle("POST", "/slack/events", sign(body), body).status == 200
+    assert len(queue) == 1
+    assert app.event_subscription.received == []
+    headers = {**sign(body), "x-slack-retry-num": "1"}
+    assert app.handle("POST", "/slack/events", headers, body).status == 200
+    assert len(queue) == 1
+
+
+def test_handle_commands():
+    app = build_app()
+    body = urllib.parse.urlencode({"command": "/echo", "text": "hello world", "team_id": "T1"}).encode()
+    response = app.handle("POST", "/slack/commands", sign(body), body)
+    assert response.status == 200
+    assert json.loads(response.body) == {"response_type": "in_channel", "text": "hello world"}
+
+    body = urllib.parse.urlencode({"command": "/ping"}).encode()
+    response = app.handle("POST", "/slack/commands", sign(body), body)
+    assert (response.content_type, response.body) == ("text/plain; charset=utf-8", b"pong")
+
+
+def test_wsgi():
+    app = build_app()
+    body = urllib.parse.urlencode({"command": "/echo", "text": "wsgi"}).encode()
+    environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/slack/commands", "CONTENT_LENGTH": str(len(body)),
+               "CONTENT_TYPE": "application/x-www-form-urlencoded", "wsgi.input": io.BytesIO(body)}
+    for k, v in sign(body).items():
+        environ[f"HTTP_{k.upper().replace('-', '_')}"] = v
+    setup_testing_defaults(environ)
+    started = []
+    response = app.wsgi(environ, lambda status, headers: started.append((status, headers)))
+    assert started[0][0] == "200 OK"
+    assert ("Content-Type", "application/json; charset=utf-8") in started[0][1]
+    assert json.loads(b"".join(response))["text"] == "wsgi"
+
+
+def test_wsgi_received_at():
+    clock = FakeClock()
+    sc = SlashCommand("server", clock=clock)
+
+    @sc.add(command="/remaining", deadline=2.5)
+    def remaining(params, remaining):
+        return str(remaining)
+
+    class SlowInput(io.BytesIO):
+        # the deadline counts the time to read the body
+        def read(self, size=-1):
+            clock.advance(1)
+            return super().read(size)
+
+    app = SlackHttpApp(slash_command=sc)
+    body = urllib.parse.urlencode({"command": "/remaining"}).encode()
+    environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/slack/commands", "CONTENT_LENGTH": str(len(body)),
+               "wsgi.input": SlowInput(body)}
+    setup_testing_defaults(environ)
+    assert app.wsgi(environ, lambda status, headers: None) == [b"1.5"]
+    assert sc.now() == clock.now
+    sc.close()
+
+
+def test_asgi():
+    app = build_app(max_body_size=1024)
+
+    async def request(body: bytes, headers: dict, chunk_size: int = 10) -> list:
+        messages = [{"type": "http.request", "body": body[i:i + chunk_size], "more_body": i + chunk_size < len(body)}
+                    for i in range(0, len(body), chunk_size)]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/slack/commands",
+                 "headers": [(k.encode(), v.encode()) for k, v in headers.items()]}
+        await app.asgi(scope, receive, send)
+        return sent
+
+    body = urllib.parse.urlencode({"command": "/echo", "text": "asgi"}).encode()
+    sent = asyncio.run(request(body, sign(body)))
+    assert sent[0]["status"] == 200
+    assert (b"content-type", b"application/json; charset=utf-8") in sent[0]["headers"]
+    assert json.loads(sent[1]["body"])["text"] == "asgi"
+
+    body = b"text=" + b"a" * 2000
+    assert asyncio.run(request(body, sign(body), chunk_size=500))[0]["status"] == 413
+
+    async def lifespan() -> list:
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        await app.asgi({"type": "lifespan"}, receive, send)
+        return sent
+
+    closed_in = []
+    close = app.close
+    app.close = lambda: closed_in.append(threading.get_ident()) or close()
+    assert asyncio.run(lifespan()) == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    # closed in a thread, not to block the event loop
+    assert closed_in and closed_in[0] != threading.get_ident()
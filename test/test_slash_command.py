@@ -146,3 +146,44 @@ def test_argument_name_invalid_error():
         def event_subscription_condition_error(invalid_argument):
             print(invalid_argument)
             return "error"
+
+
+def test_multiple_unconditional_error():
+    with pytest.raises(SlackApiDecoratorException):
+        @sc1.add(command=cmd1)
+        def sc1_unconditional_error(params):
+            print(params)
+            return "error"
+
+
+def test_team_scoped_command():
+    sc = SlashCommand("team")
+
+    @sc.add(command="/oncall")
+    def oncall(params):
+        return "global"
+
+    @sc.add(command="/oncall", team_id=["T1", "T2"])
+    def oncall_t1(params):
+        return "T1"
+
+    @sc.add(command="/deploy", enterprise_id="E1")
+    def deploy(params):
+        return "E1"
+
+    assert sc.execute(generate_slash_command_payload_type_1(command="/oncall")) == "global"
+    assert sc.execute(generate_slash_command_payload_type_1(command="/oncall", team_id="T1")) == "T1"
+    assert sc.execute(generate_slash_command_payload_type_2(command="/oncall", team_id="T2")) == "T1"
+    payload = generate_slash_command_payload_type_2(command="/deploy")
+    payload["enterprise_id"] = "E1"
+    assert sc.execute(payload) == "E1"
+    with pytest.raises(SlackApiDecoratorException):
+        sc.execute(generate_slash_command_payload_type_2(command="/deploy"))
+
+
+@pytest.mark.parametrize("team_id", [1, [], [1]])
+def test_team_id_invalid_error(team_id):
+    with pytest.raises(SlackApiDecoratorException):
+        @sc1.add(command="/sc1_error", team_id=team_id)
+        def sc1_team_error(params):
+            return "error"
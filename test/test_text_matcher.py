@@ -0,0 +1,63 @@
+import re
+
+from slack_api_decorator.error import SlackApiDecoratorException
+from slack_api_decorator.text_matcher import (
+    TextMatcher, compile_keywords, compile_text_pattern, keywords_key, pattern_key
+)
+import pytest
+
+deploy = keywords_key(compile_keywords(["Deploy", "release"]))
+deploy_now = keywords_key(compile_keywords(["deploy now"]))
+plus_one = keywords_key(compile_keywords(["+1"]))
+build_fails = keywords_key(compile_keywords(["build fails", "fails again"]))
+incident = compile_text_pattern(r"INC-\d+")
+hello = compile_text_pattern(re.compile(r"^hello", re.IGNORECASE))
+matcher = TextMatcher([incident, hello, incident],
+                      [v[1] for v in [deploy, deploy_now, plus_one, build_fails, deploy]])
+
+
+@pytest.mark.parametrize("text, ideal_result", [
+    ("", set()),
+    ("nothing", set()),
+    ("please DEPLOY now", {deploy, deploy_now}),
+    ("deploy nowhere", {deploy}),
+    ("redeploy", set()),
+    ("+1 for INC-123", {plus_one, pattern_key(incident)}),
+    ("+12", set()),
+    ("Hello, release INC-1 +1", {pattern_key(hello), deploy, pattern_key(incident), plus_one}),
+    # overlapping keywords
+    ("the build fails again", {build_fails}),
+    ("say hello", set()),
+])
+def test_text_matcher_scan(text, ideal_result):
+    assert matcher.scan(text) == ideal_result
+
+
+def test_text_matcher_overlapping_patterns():
+    # all patterns matching at the same position are found
+    short, long = compile_text_pattern("ab"), compile_text_pattern("abc")
+    assert TextMatcher([short, long], []).scan("abc") == {pattern_key(short), pattern_key(long)}
+
+
+def test_compile_text_pattern_flags():
+    # inline global flags are scoped to the pattern, not to the others
+    inline = compile_text_pattern("(?i)deploy")
+    assert inline.pattern == "deploy" and inline.flags & re.IGNORECASE
+    ascii_word = compile_text_pattern(re.compile(r"^\w+$", re.ASCII))
+    matcher = TextMatcher([inline, ascii_word, incident], [])
+    assert matcher.scan("DEPLOY") == {pattern_key(inline), pattern_key(ascii_word)}
+    assert matcher.scan("ＤＥＰＬＯＹ") == set()
+    assert matcher.scan("inc-1") == set()
+
+
+@pytest.mark.parametrize("text_pattern", ["(", r"(?P<name>a)", r"(a)\1", 1, re.compile(b"a"),
+                                          "a(?i)b", re.compile("a", re.DEBUG)])
+def test_compile_text_pattern_error(text_pattern):
+    with pytest.raises(SlackApiDecoratorException):
+        compile_text_pattern(text_pattern)
+
+
+@pytest.mark.parametrize("keywords", ["deploy", [], [""], [1]])
+def test_compile_keywords_error(keywords):
+    with pytest.raises(SlackApiDecoratorException):
+        compile_keywords(keywords)
@@ -0,0 +1,125 @@
+import json
+import logging
+
+from slack_api_decorator import EventSubscription, SlashCommand
+from slack_api_decorator.error import SlackApiDecoratorException
+from slack_api_decorator.tracing import LoggingSink, TraceRecord, Tracer
+import pytest
+
+from .test_event_subscription import generate_message_payload, generate_reaction_payload
+from .test_slash_command import generate_slash_command_payload_type_1
+
+
+def test_trace_event_subscription():
+    records = []
+    es = EventSubscription("trace", tracer=Tracer(sink=records.append))
+
+    @es.add("reaction_added", reaction="+1")
+    def plus_one(params):
+        return "plus_one"
+
+    @es.add("reaction_added", user_id="A")
+    def user_a(params):
+        return "user_a"
+
+    @es.add("reaction_added")
+    def fallback(params):
+        return "fallback"
+
+    es.add_ignore_user_id_list("UBOT")
+
+    assert es.execute(generate_reaction_payload(reaction="+1")) == "plus_one"
+    assert es.execute(generate_reaction_payload(reaction="+1", user_id="A")) == "fallback"
+    assert es.execute(generate_reaction_payload(user_id="UBOT")) is None
+    with pytest.raises(SlackApiDecoratorException):
+        es.execute(generate_message_payload())
+
+    ok, both, dropped, error = records
+    assert ok.key == "reaction_added" and ok.team_id == "Txxxxxxxx"
+    assert ok.decision == "conditional" and ok.target.endswith("plus_one") and ok.outcome == "ok"
+    assert [passed for _, passed in ok.conditions] == [True, False]
+    assert both.decision == "fallback" and both.target.endswith("fallback")
+    assert dropped.outcome == "dropped" and dropped.target is None
+    assert error.outcome == "error" and error.key == "message"
+    assert ok.total_seconds >= ok.resolve_seconds >= 0
+    assert json.loads(str(error))["error"].startswith("DecoratorExecuteError")
+
+
+def test_trace_slash_command():
+    records = []
+    sc = SlashCommand("trace", tracer=Tracer(sink=records.append))
+
+    @sc.add(command="/status")
+    def status(params):
+        return "status"
+
+    @sc.add(command="/none", guard=True)
+    def guard(params):
+        return "guard"
+
+    sc.execute(generate_slash_command_payload_type_1(command="/status"))
+    sc.execute(generate_slash_command_payload_type_1(command="/other"))
+    assert [(v.key, v.decision, v.outcome) for v in records] == [
+        ("/status", "single", "ok"), ("/other", "guard", "ok")]
+
+
+def test_trace_sampling():
+    records = []
+    values = iter([0.05, 0.5, 0.09, 0.99])
+    es = EventSubscription("trace", tracer=Tracer(sink=records.append, sample_rate=0.1,
+                                                  random_function=lambda: next(values)))
+
+    @es.add("message")
+    def message(params):
+        return "message"
+
+    for _ in range(4):
+        assert es.execute(generate_message_payload()) == "message"
+    assert len(records) == 2
+
+
+def test_logging_sink_is_lazy(caplog):
+    formatted = []
+
+    class Record(TraceRecord):
+        __slots__ = ()
+
+        def __str__(self):
+            formatted.append(1)
+            return "record"
+
+    logger = logging.getLogger("test_tracing")
+    record = Record(app_name="trace", kind="event_subscription", clock=lambda: 0.0)
+    with caplog.at_level(logging.WARNING, logger="test_tracing"):
+        LoggingSink(logger=logger, level=logging.INFO)(record)
+        assert formatted == []
+        LoggingSink(logger=logger, level=logging.WARNING)(record)
+    assert formatted
+    assert "record" in caplog.text
+
+
+def test_sink_error_does_not_change_result(caplog):
+    def broken_sink(record):
+        raise RuntimeError("sink is down")
+
+    es = EventSubscription("trace", tracer=Tracer(sink=broken_sink))
+
+    @es.add("reaction_added")
+    def reaction(params):
+        return "reaction"
+
+    @es.add("message")
+    def message(params):
+        raise ValueError("message")
+
+    with caplog.at_level(logging.ERROR, logger="slack_api_decorator.tracing"):
+        assert es.execute(generate_reaction_payload()) == "reaction"
+        # the error of the function is raised, not the one of the sink
+        with pytest.raises(ValueError):
+            es.execute(generate_message_payload())
+    assert "sink is down" in caplog.text
+
+
+def test_sample_rate_error():
+    with pytest.raises(SlackApiDecoratorException):
+        Tracer(sink=print, sample_rate=1.5)
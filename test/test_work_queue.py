@@ -0,0 +1,136 @@
+import threading
+
+from slack_api_decorator import EventSubscription
+from slack_api_decorator.error import SlackApiDecoratorException
+from slack_api_decorator.work_queue import InMemoryQueue, QueueWorker, SQLiteQueue, WorkQueue
+import pytest
+
+from .test_deadline import FakeClock
+from .test_event_subscription import generate_message_payload, generate_reaction_payload
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def queue_and_clock(request, tmp_path):
+    clock = FakeClock(now=1000.0)
+    if request.param == "memory":
+        yield InMemoryQueue(clock=clock), clock
+    else:
+        queue = SQLiteQueue(str(tmp_path / "queue.sqlite3"), clock=clock)
+        yield queue, clock
+        queue.close()
+
+
+def test_queue_visibility_timeout(queue_and_clock):
+    queue, clock = queue_and_clock
+    ids = [queue.put({"i": i}) for i in range(3)]
+
+    batch = queue.get_batch(max_messages=2, visibility_timeout=10)
+    assert [v.payload for v in batch] == [{"i": 0}, {"i": 1}]
+    assert [v.attempts for v in batch] == [1, 1]
+    # received messages are invisible
+    assert [v.payload for v in queue.get_batch(max_messages=10, visibility_timeout=10)] == [{"i": 2}]
+    assert queue.get_batch(max_messages=10) == []
+
+    queue.ack(ids[0])
+    clock.advance(11)
+    # not acked messages are received again
+    batch = queue.get_batch(max_messages=10, visibility_timeout=10)
+    assert [v.payload for v in batch] == [{"i": 1}, {"i": 2}]
+    assert [v.attempts for v in batch] == [2, 2]
+    assert len(queue) == 2
+
+
+def test_sqlite_queue_is_durable(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    queue = SQLiteQueue(path)
+    queue.put(generate_reaction_payload())
+    queue.close()
+
+    reopened = SQLiteQueue(path)
+    assert [v.payload for v in reopened.get_batch()] == [generate_reaction_payload()]
+    reopened.close()
+
+
+def test_queue_worker(queue_and_clock):
+    queue, clock = queue_and_clock
+    es = EventSubscription("queue", queue=queue)
+    received = []
+    fail_once = threading.Event()
+
+    @es.add("reaction_added")
+    def reaction_added(params):
+        received.append(params["event"]["reaction"])
+
+    @es.add("message")
+    def message(params):
+        if not fail_once.is_set():
+            fail_once.set()
+            raise ValueError("temporary error")
+        received.append("message")
+
+    es.enqueue(generate_reaction_payload(reaction="+1"))
+    es.enqueue(generate_message_payload())
+    es.enqueue(generate_reaction_payload(reaction="sun"))
+
+    worker = QueueWorker(es, queue, batch_size=2, concurrency=2, visibility_timeout=10)
+    assert worker.run_once() == 2
+    assert worker.run_once() == 1
+    assert worker.run_once() == 0
+    # the failed message is received again after the visibility timeout
+    clock.advance(11)
+    assert worker.run_once() == 1
+    worker.close()
+    assert sorted(received) == ["+1", "message", "sun"]
+    assert len(queue) == 0
+
+
+def test_queue_worker_max_attempts():
+    clock = FakeClock()
+    queue = InMemoryQueue(clock=clock)
+    es = EventSubscription("queue", queue=queue)
+
+    @es.add("message")
+    def message(params):
+        raise ValueError("permanent error")
+
+    es.enqueue(generate_message_payload())
+    worker = QueueWorker(es, queue, visibility_timeout=1, max_attempts=2)
+    for _ in range(3):
+        worker.run_once()
+        clock.advance(2)
+    worker.close()
+    assert len(queue) == 0
+
+
+def test_queue_worker_run_until_stopped():
+    queue = InMemoryQueue()
+    es = EventSubscription("queue", queue=queue)
+    stop = threading.Event()
+
+    @es.add("message")
+    def message(params):
+        stop.set()
+
+    es.enqueue(generate_message_payload())
+    worker = QueueWorker(es, queue, poll_interval=0.01)
+    worker.run(stop)
+    worker.close()
+    assert len(queue) == 0
+
+
+def test_enqueue_error():
+    with pytest.raises(SlackApiDecoratorException):
+        EventSubscription("queue").enqueue(generate_message_payload())
+    with pytest.raises(SlackApiDecoratorException):
+        EventSubscription("queue", queue=InMemoryQueue()).enqueue({"no": "event"})
+
+
+def test_work_queue_is_abstract():
+    class PutOnlyQueue(WorkQueue):
+        def put(self, payload: dict) -> int:
+            return 1
+
+    with pytest.raises(TypeError):
+        WorkQueue()
+    with pytest.raises(TypeError):
+        PutOnlyQueue()